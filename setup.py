@@ -29,6 +29,7 @@ setuptools.setup(
     zip_safe=False,
     python_requires=">=3.6",
     install_requires=["click", "requests", "attrs", "tomli>=1.2.1", "tomli-w>=0.3.0"],
+    extras_require={"async": ["httpx"], "speedups": ["orjson"]},
     entry_points={"console_scripts": ["labels = labels.cli:labels"]},
     classifiers=[
         "Development Status :: 3 - Alpha",
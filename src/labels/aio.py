@@ -0,0 +1,249 @@
+"""Asyncio support for the GitHub API, which requires the httpx package."""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, List, Mapping, Optional
+
+import httpx
+
+from labels.exceptions import GitHubException, LabelsException
+from labels.github import Label, Repository
+from labels.plan import compute_plan
+
+
+class AsyncClient:
+    auth: Any
+    base_url: str
+    per_page: int
+    session: httpx.AsyncClient
+    _owns_session: bool
+
+    def __init__(
+        self,
+        auth: Any,
+        base_url: str = "https://api.github.com",
+        *,
+        per_page: int = 100,
+        session: Optional[httpx.AsyncClient] = None,
+    ) -> None:
+        self.auth = auth
+        self.base_url = base_url
+        self.per_page = per_page
+        self.session = httpx.AsyncClient() if session is None else session
+        self._owns_session = session is None
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connections, unless the session was
+        passed in, as it may be shared with other clients.
+        """
+        if self._owns_session:
+            await self.session.aclose()
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a request with the auth of the client.
+
+        The auth is passed per request rather than set on the session, which
+        may be shared with other clients.
+        """
+        kwargs.setdefault("auth", self.auth)
+
+        try:
+            return await self.session.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            raise GitHubException(f"Error sending request: {exc}") from exc
+
+    async def list_labels(self, repo: Repository) -> List[Label]:
+        """Return the list of Labels from the repository.
+
+        GitHub API docs:
+        https://developer.github.com/v3/issues/labels/#list-all-labels-for-this-repository
+        """
+        logger = logging.getLogger("labels")
+        logger.debug(f"Requesting labels for {repo.owner}/{repo.name}")
+
+        headers = {"Accept": "application/vnd.github.symmetra-preview+json"}
+
+        response = await self._request(
+            "GET",
+            f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels",
+            headers=headers,
+            params={"per_page": self.per_page},
+        )
+
+        if response.status_code != 200:
+            raise GitHubException(
+                f"Error retrieving labels: "
+                f"{response.status_code} - "
+                f"{response.reason_phrase}"
+            )
+
+        repo_labels: List[Dict] = response.json()
+
+        next_page: Optional[Dict] = response.links.get("next", None)
+
+        while next_page is not None:
+
+            logger.debug("Requesting next page of labels")
+            response = await self._request("GET", next_page["url"], headers=headers)
+
+            if response.status_code != 200:
+                raise GitHubException(
+                    f"Error retrieving next page of labels: "
+                    f"{response.status_code} - "
+                    f"{response.reason_phrase}"
+                )
+
+            repo_labels.extend(response.json())
+
+            next_page = response.links.get("next", None)
+
+        return [Label(**label) for label in repo_labels]
+
+    async def get_label(self, repo: Repository, *, name: str) -> Label:
+        """Return a single Label from the repository.
+
+        GitHub API docs:
+        https://developer.github.com/v3/issues/labels/#get-a-single-label
+        """
+        logger = logging.getLogger("labels")
+        logger.debug(f"Requesting label '{name}' for {repo.owner}/{repo.name}")
+
+        response = await self._request(
+            "GET",
+            f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels/{name}",
+            headers={"Accept": "application/vnd.github.symmetra-preview+json"},
+        )
+
+        if response.status_code != 200:
+            raise GitHubException(
+                f"Error retrieving label {name}: "
+                f"{response.status_code} - "
+                f"{response.reason_phrase}"
+            )
+
+        return Label(**response.json())
+
+    async def create_label(self, repo: Repository, *, label: Label) -> Label:
+        """Create a new Label for the repository.
+
+        GitHub API docs:
+        https://developer.github.com/v3/issues/labels/#create-a-label
+        """
+        logger = logging.getLogger("labels")
+        logger.debug(f"Creating label '{label.name}' for {repo.owner}/{repo.name}")
+
+        response = await self._request(
+            "POST",
+            f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels",
+            headers={"Accept": "application/vnd.github.symmetra-preview+json"},
+            json=label.params_dict,
+        )
+
+        if response.status_code != 201:
+            raise GitHubException(
+                f"Error creating label {label.name}: "
+                f"{response.status_code} - "
+                f"{response.reason_phrase}"
+            )
+
+        return Label(**response.json())
+
+    async def edit_label(self, repo: Repository, *, name: str, label: Label) -> Label:
+        """Update a GitHub issue label.
+
+        GitHub API docs:
+        https://developer.github.com/v3/issues/labels/#update-a-label
+        """
+        logger = logging.getLogger("labels")
+        logger.debug(f"Editing label '{name}' for {repo.owner}/{repo.name}")
+
+        response = await self._request(
+            "PATCH",
+            f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels/{name}",
+            headers={"Accept": "application/vnd.github.symmetra-preview+json"},
+            json=label.params_dict,
+        )
+
+        if response.status_code != 200:
+            raise GitHubException(
+                f"Error editing label {name}: "
+                f"{response.status_code} - "
+                f"{response.reason_phrase}"
+            )
+
+        return Label(**response.json())
+
+    async def delete_label(self, repo: Repository, *, name: str) -> None:
+        """Delete a GitHub issue label.
+
+        GitHub API docs:
+        https://developer.github.com/v3/issues/labels/#delete-a-label
+        """
+        logger = logging.getLogger("labels")
+        logger.debug(f"Deleting label '{name}' for {repo.owner}/{repo.name}")
+
+        response = await self._request(
+            "DELETE",
+            f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels/{name}",
+        )
+
+        if response.status_code != 204:
+            raise GitHubException(
+                f"Error deleting label {name}: "
+                f"{response.status_code} - "
+                f"{response.reason_phrase}"
+            )
+
+
+async def sync_labels(
+    client: AsyncClient,
+    repo: Repository,
+    local_labels: Mapping[str, Label],
+    *,
+    jobs: int = 10,
+) -> Dict[str, LabelsException]:
+    """Sync the local labels with a GitHub repository.
+
+    The local labels map remote label names to the desired Label, just like
+    the sections of a labels file. Labels are deleted first, then updated and
+    then created, with up to the given number of jobs requests in flight.
+
+    Return a dict mapping the names of labels that could not be modified to
+    the corresponding exception. Raise a PlanException if the local labels
+    cannot be synced.
+    """
+    plan = compute_plan(local_labels, await client.list_labels(repo))
+
+    semaphore = asyncio.Semaphore(jobs)
+    failures: Dict[str, LabelsException] = {}
+
+    async def run(name: str, request: Awaitable[Any]) -> None:
+        async with semaphore:
+            try:
+                await request
+            except LabelsException as exc:
+                failures[name] = exc
+
+    await asyncio.gather(
+        *(run(name, client.delete_label(repo, name=name)) for name in plan.delete)
+    )
+    await asyncio.gather(
+        *(
+            run(name, client.edit_label(repo, name=name, label=label))
+            for name, label in plan.update.items()
+        )
+    )
+    await asyncio.gather(
+        *(
+            run(name, client.create_label(repo, label=label))
+            for name, label in plan.create.items()
+        )
+    )
+
+    return failures
@@ -0,0 +1,120 @@
+"""Compact binary format for labels, which is faster to read and write than
+TOML for large snapshots and remote state.
+
+A file starts with MAGIC, followed by entries of a key, a list of pages and
+a table of labels. Strings are encoded as UTF-8 and prefixed with their
+length, and lists and tables are prefixed with their number of items, all
+as little-endian unsigned 32-bit integers.
+"""
+
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Mapping, Sequence, Tuple
+
+from labels.github import Label, Page
+
+MAGIC = b"LABELS\x00\x02"
+
+LENGTH = struct.Struct("<I")
+
+Entry = Tuple[str, List[Page], Dict[str, Label]]
+
+
+def write_entry(
+    binary_file: BinaryIO,
+    key: str,
+    labels: Mapping[str, Label],
+    pages: Sequence[Page] = (),
+) -> None:
+    """Append an entry to an open binary file, starting with MAGIC if the
+    file is empty.
+    """
+    if binary_file.tell() == 0:
+        binary_file.write(MAGIC)
+
+    binary_file.write(encode_entry(key, labels, pages))
+
+
+def encode_entry(
+    key: str, labels: Mapping[str, Label], pages: Sequence[Page] = ()
+) -> bytes:
+    """Return the encoded entry, which does not include MAGIC."""
+    buffer = bytearray()
+
+    def add_length(length: int) -> None:
+        buffer.extend(LENGTH.pack(length))
+
+    def add_string(value: str) -> None:
+        data = value.encode("utf-8")
+        add_length(len(data))
+        buffer.extend(data)
+
+    add_string(key)
+
+    add_length(len(pages))
+    for page in pages:
+        add_string(page.url)
+        add_string(page.etag)
+        add_string(page.link)
+
+    add_length(len(labels))
+    for name, label in labels.items():
+        add_string(name)
+        add_string(label.color)
+        add_string(label.name)
+        add_string(label.description)
+        add_length(len(label.previous_names))
+        for previous_name in label.previous_names:
+            add_string(previous_name)
+
+    return bytes(buffer)
+
+
+def read_entries(data: bytes) -> Iterator[Entry]:
+    """Yield the entries of the contents of a binary file.
+
+    Raise a ValueError if the data is not in the binary format.
+    """
+    if not data.startswith(MAGIC):
+        raise ValueError("Invalid binary labels file")
+
+    view = memoryview(data)
+    offset = len(MAGIC)
+
+    def read_length() -> int:
+        nonlocal offset
+        (length,) = LENGTH.unpack_from(view, offset)
+        offset += LENGTH.size
+        return int(length)
+
+    def read_string() -> str:
+        nonlocal offset
+        length = read_length()
+        end = offset + length
+        if end > len(view):
+            raise ValueError("Truncated binary labels file")
+        value = str(view[offset:end], "utf-8")
+        offset = end
+        return value
+
+    try:
+        while offset < len(view):
+            key = read_string()
+
+            pages = [
+                Page(url=read_string(), etag=read_string(), link=read_string())
+                for _ in range(read_length())
+            ]
+
+            labels = {}
+            for _ in range(read_length()):
+                name = read_string()
+                labels[name] = Label(
+                    color=read_string(),
+                    name=read_string(),
+                    description=read_string(),
+                    previous_names=[read_string() for _ in range(read_length())],
+                )
+
+            yield key, pages, labels
+    except struct.error as exc:
+        raise ValueError("Truncated binary labels file") from exc
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+# Headers of a 304 response that replace those of the cached response
+REVALIDATED_HEADERS = ("ETag", "Last-Modified", "Link")
+
+
+class HTTPCache:
+    """On-disk cache for responses to conditional GET requests.
+
+    Every cached response is stored in a JSON file in the cache directory,
+    named after a hash of the full request URL. The cache is not aware of
+    credentials, so use separate directories for different GitHub accounts.
+    """
+
+    directory: str
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url: str) -> str:
+        """Return the path to the cache file for the given URL."""
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, url: str) -> Optional[requests.Response]:
+        """Return the cached response for the given URL if there is one."""
+        try:
+            with open(self.path(url), "r", encoding="utf-8") as cache_file:
+                entry = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("url") != url:
+            return None
+
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response.encoding = "utf-8"
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["content"].encode("utf-8")
+        return response
+
+    def set(self, url: str, response: requests.Response) -> None:
+        """Store the response for the given URL if it has validators."""
+        if "ETag" not in response.headers and "Last-Modified" not in response.headers:
+            return
+
+        logger = logging.getLogger("labels")
+        logger.debug(f"Caching response for {url}")
+
+        entry = {
+            "url": url,
+            "headers": {
+                name: response.headers[name]
+                for name in CACHED_HEADERS
+                if name in response.headers
+            },
+            "content": response.text,
+        }
+
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as cache_file:
+                json.dump(entry, cache_file)
+            os.replace(temp_path, self.path(url))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def conditional_headers(response: requests.Response) -> Dict[str, str]:
+    """Return the request headers to revalidate a cached response."""
+    headers = {}
+
+    if "ETag" in response.headers:
+        headers["If-None-Match"] = response.headers["ETag"]
+
+    if "Last-Modified" in response.headers:
+        headers["If-Modified-Since"] = response.headers["Last-Modified"]
+
+    return headers
+
+
+def update_headers(cached: requests.Response, response: requests.Response) -> bool:
+    """Copy the validators and the Link header of a 304 response onto the
+    cached response that it revalidated, as labels added on a new page change
+    the Link header but not the content of the earlier pages.
+
+    Return whether any of the headers of the cached response changed.
+    """
+    changed = False
+
+    for name in REVALIDATED_HEADERS:
+        value = response.headers.get(name)
+
+        if value is not None and cached.headers.get(name) != value:
+            cached.headers[name] = value
+            changed = True
+
+    return changed
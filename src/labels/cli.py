@@ -1,27 +1,57 @@
+import itertools
 import logging
 import operator
 import sys
+import threading
 import typing
 
-import attr
 import click
-from requests.auth import HTTPBasicAuth
 
-from labels import __version__, utils
-from labels.exceptions import LabelsException
-from labels.github import Client, Label, Repository
-from labels.io import read_labels, write_labels
+from labels import __version__
+from labels.exceptions import GitHubException, LabelsException
 from labels.log import create_logger
 
-Labels_Dict = typing.Dict[str, Label]
+# Modules that require requests, attrs or the TOML packages are imported by
+# the commands that use them, so that the CLI starts quickly
+if typing.TYPE_CHECKING:
+    from labels.github import Client, Label, Repository
+    from labels.plan import Plan
+
+Labels_Dict = typing.Dict[str, "Label"]
+
+# Number of repositories to request labels for in a single GraphQL query.
+GRAPHQL_BATCH_SIZE = 20
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
 
 
-@attr.s(auto_attribs=True)
 class LabelsContext:
-    """Extra context for label CLI commands."""
+    """Extra context for label CLI commands.
+
+    The client is only created once a command uses it. All commands share a
+    single client, even if they first use it from worker threads.
+    """
+
+    repository: typing.Optional["Repository"]
 
-    client: Client
-    repository: typing.Optional[Repository] = None
+    def __init__(
+        self,
+        client_factory: typing.Callable[[], "Client"],
+        repository: typing.Optional["Repository"] = None,
+    ) -> None:
+        self._client_factory = client_factory
+        self._client: typing.Optional["Client"] = None
+        self._lock = threading.Lock()
+        self.repository = repository
+
+    @property
+    def client(self) -> "Client":
+        """Return the client for the GitHub API."""
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
 
 
 @click.group()
@@ -44,7 +74,35 @@ class LabelsContext:
     required=True,
     envvar="LABELS_TOKEN",
 )
-def labels(ctx, username: str, token: str, verbose: bool) -> None:
+@click.option(
+    "--cache-dir",
+    help="Directory for caching API responses",
+    type=click.Path(file_okay=False),
+    envvar="LABELS_CACHE_DIR",
+)
+@click.option(
+    "--retries",
+    help="Number of retries for transient API errors",
+    default=3,
+    type=click.IntRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--pool-size",
+    help="Number of connections to keep open for reuse",
+    default=10,
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+def labels(
+    ctx,
+    username: str,
+    token: str,
+    verbose: bool,
+    cache_dir: typing.Optional[str],
+    retries: int,
+    pool_size: int,
+) -> None:
     """labels - CLI to manage GitHub issue labels."""
 
     logger = create_logger()
@@ -54,13 +112,30 @@ def labels(ctx, username: str, token: str, verbose: bool) -> None:
     else:
         logger.setLevel(logging.INFO)
 
-    ctx.obj = LabelsContext(Client(HTTPBasicAuth(username, token)))
+    def create_client() -> "Client":
+        from requests.auth import HTTPBasicAuth
+
+        from labels.cache import HTTPCache
+        from labels.github import Client, LabelPool
+        from labels.transport import create_retry_policy
+
+        return Client(
+            HTTPBasicAuth(username, token),
+            cache=None if cache_dir is None else HTTPCache(cache_dir),
+            retries=create_retry_policy(total=retries),
+            pool_maxsize=pool_size,
+            label_pool=LabelPool(),
+        )
+
+    ctx.obj = LabelsContext(create_client)
 
 
 @click.pass_obj
 def default_owner(labels_context: LabelsContext) -> str:
     """Load repository owner information from the local working tree."""
     if labels_context.repository is None:
+        from labels import utils
+
         repository = utils.load_repository_info()
         if repository is None:
             raise click.BadParameter(
@@ -74,6 +149,8 @@ def default_owner(labels_context: LabelsContext) -> str:
 def default_repo(labels_context: LabelsContext) -> str:
     """Load repository name information from the local working tree."""
     if labels_context.repository is None:
+        from labels import utils
+
         repository = utils.load_repository_info()
         if repository is None:
             raise click.BadParameter(
@@ -109,16 +186,28 @@ def default_repo(labels_context: LabelsContext) -> str:
     type=click.Path(),
     required=True,
 )
-def fetch_cmd(context: LabelsContext, owner: str, repo: str, filename: str) -> None:
+@click.option(
+    "-j",
+    "--jobs",
+    help="Number of concurrent requests",
+    default=1,
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+def fetch_cmd(
+    context: LabelsContext, owner: str, repo: str, filename: str, jobs: int
+) -> None:
     """Fetch labels for a GitHub repository.
 
     This will write the labels information to disk to the specified filename.
     """
+    from labels.github import Repository
+    from labels.io import write_labels
 
     repository = Repository(owner, repo)
 
     try:
-        labels = context.client.list_labels(repository)
+        labels = context.client.list_labels(repository, jobs=jobs)
     except LabelsException as exc:
         click.echo(str(exc))
         sys.exit(1)
@@ -129,6 +218,105 @@ def fetch_cmd(context: LabelsContext, owner: str, repo: str, filename: str) -> N
     )
 
 
+@labels.command("fetch-many")
+@click.pass_obj
+@click.option(
+    "--repos-file",
+    help="File with one owner/repo per line",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option("--org", help="Fetch all repositories of a GitHub organization", type=str)
+@click.option(
+    "-f",
+    "--filename",
+    help="Filename for the snapshot",
+    default="snapshot.toml",
+    type=click.Path(),
+    required=True,
+)
+@click.option(
+    "-j",
+    "--jobs",
+    help="Number of repositories to fetch concurrently",
+    default=4,
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--graphql",
+    help="Fetch the labels of several repositories per request",
+    is_flag=True,
+)
+def fetch_many_cmd(
+    context: LabelsContext,
+    repos_file: typing.Optional[str],
+    org: typing.Optional[str],
+    filename: str,
+    jobs: int,
+    graphql: bool,
+) -> None:
+    """Fetch labels for many GitHub repositories.
+
+    This will write the labels of all repositories to a single snapshot file,
+    with one table per "owner/repo". Repositories are written as soon as
+    their labels have been fetched. With the graphql option, the labels of
+    several repositories are fetched with a single GraphQL query.
+    """
+    from labels.executor import execute
+    from labels.io import is_binary, write_snapshot_entry
+
+    repositories = load_repositories(context, repos_file, org)
+    client = context.client
+
+    def fetch_batch(
+        batch: typing.List["Repository"],
+    ) -> typing.Tuple[
+        typing.Dict["Repository", typing.List["Label"]],
+        typing.Dict["Repository", GitHubException],
+    ]:
+        if graphql:
+            return client.list_labels_graphql(batch)
+        return {repository: client.list_labels(repository) for repository in batch}, {}
+
+    batch_size = GRAPHQL_BATCH_SIZE if graphql else 1
+    remaining = iter(repositories)
+    batches = iter(lambda: list(itertools.islice(remaining, batch_size)), [])
+
+    failed = False
+
+    with open(filename, "wb") as snapshot_file:
+        for batch, result, error in execute(
+            in_context(fetch_batch), batches, jobs=jobs
+        ):
+            if result is None:
+                failed = True
+                for repository in batch:
+                    click.echo(
+                        f"{repository.owner}/{repository.name}: {error}", err=True
+                    )
+                continue
+
+            repo_labels, repo_errors = result
+
+            for repository, repo_error in repo_errors.items():
+                failed = True
+                click.echo(
+                    f"{repository.owner}/{repository.name}: {repo_error}", err=True
+                )
+
+            for repository, labels in repo_labels.items():
+                labels.sort(key=operator.attrgetter("name", "description", "color"))
+                write_snapshot_entry(
+                    snapshot_file,
+                    repository,
+                    labels,
+                    binary_format=is_binary(filename),
+                )
+
+    if failed:
+        sys.exit(1)
+
+
 @labels.command("sync")
 @click.pass_obj
 @click.option(
@@ -156,128 +344,456 @@ def fetch_cmd(context: LabelsContext, owner: str, repo: str, filename: str) -> N
     type=click.Path(exists=True),
     required=True,
 )
+@click.option(
+    "-j",
+    "--jobs",
+    help="Number of concurrent requests",
+    default=1,
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--detect-renames",
+    help="Turn matching deletes and creates into renames",
+    is_flag=True,
+)
+@click.option(
+    "--state-file",
+    help="File for the remote labels as of the last sync",
+    type=click.Path(dir_okay=False),
+)
 def sync_cmd(
-    context: LabelsContext, owner: str, repo: str, filename: str, dryrun: bool
+    context: LabelsContext,
+    owner: str,
+    repo: str,
+    filename: str,
+    dryrun: bool,
+    jobs: int,
+    detect_renames: bool,
+    state_file: typing.Optional[str],
 ) -> None:
     """Sync labels with a GitHub repository.
 
     On success this will also update the local labels file, so that section
-    names match the `name` parameter.
+    names match the `name` parameter. With a state file, the remote labels
+    are only listed again if they changed since the last sync.
     """
-    labels_to_delete = {}
-    labels_to_update = {}
-    labels_to_create = {}
-    labels_to_ignore = {}
+    from labels.github import Repository
+    from labels.io import read_labels, read_state, write_state
+    from labels.plan import compute_plan
+    from labels.state import RemoteState, list_labels_incremental
 
     local_labels = read_labels(filename)
 
     repository = Repository(owner, repo)
 
+    states = {} if state_file is None else read_state(state_file)
+
     try:
-        remote_labels = {
-            label.name: label for label in context.client.list_labels(repository)
-        }
+        remote_labels, pages = list_labels_incremental(
+            context.client, repository, states.get(repository), jobs=jobs
+        )
+        plan = compute_plan(
+            local_labels, remote_labels, detect_renames=detect_renames
+        )
     except LabelsException as exc:
         click.echo(str(exc), err=True)
         sys.exit(1)
 
-    for remote_name, local_label in local_labels.items():
-        if remote_name in remote_labels:
+    if dryrun:
+        # Do not modify remote labels, but only print info
+        dryrun_echo(plan)
+        sys.exit(0)
+
+    failures = apply_plan(context.client, repository, plan, jobs=jobs)
 
-            remote_label = remote_labels[remote_name]
+    for error in failures.values():
+        click.echo(str(error), err=True)
 
-            if local_label.params_dict == remote_label.params_dict:
-                labels_to_ignore[remote_name] = local_label
-            else:
-                labels_to_update[remote_name] = local_label
-        else:
-            if remote_name == local_label.name:
-                labels_to_create[local_label.name] = local_label
-            else:
-                click.echo(
-                    f'There is no remote label "{remote_name}" and '
-                    f"this name does not match the name "
-                    f'parameter: "{local_label.name}"',
-                    err=True,
+    if failures:
+        sys.exit(1)
+
+    if state_file is not None:
+        try:
+            if plan.changed:
+                # The pages of the old state are outdated, so list labels
+                # again to record the remote state as of this sync
+                remote_labels, pages = context.client.list_labels_with_pages(
+                    repository, jobs=jobs
                 )
-                sys.exit(1)
+        except LabelsException as exc:
+            # Without a state, the next sync lists the remote labels again
+            click.echo(str(exc), err=True)
+            states.pop(repository, None)
+        else:
+            states[repository] = RemoteState(labels=remote_labels, pages=pages)
 
-    for remote_name, remote_label in remote_labels.items():
-        if remote_name in labels_to_update:
-            continue
+        write_state(state_file, states)
+
+    # Make sure to update TOML sections of the local labels file
+    update_sections(filename, local_labels)
+
+
+@labels.command("sync-many")
+@click.pass_obj
+@click.option(
+    "--repos-file",
+    help="File with one owner/repo per line",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option("--org", help="Sync all repositories of a GitHub organization", type=str)
+@click.option("-n", "--dryrun", help="Do not modify remote labels", is_flag=True)
+@click.option(
+    "-f",
+    "--filename",
+    help="Filename for labels",
+    default="labels.toml",
+    type=click.Path(exists=True),
+    required=True,
+)
+@click.option(
+    "-j",
+    "--jobs",
+    help="Number of repositories to sync concurrently",
+    default=4,
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--detect-renames",
+    help="Turn matching deletes and creates into renames",
+    is_flag=True,
+)
+def sync_many_cmd(
+    context: LabelsContext,
+    repos_file: typing.Optional[str],
+    org: typing.Optional[str],
+    filename: str,
+    dryrun: bool,
+    jobs: int,
+    detect_renames: bool,
+) -> None:
+    """Sync labels with many GitHub repositories.
+
+    The repositories are read from a file or listed for an organization.
+    Each repository is synced like with the sync command and a summary is
+    printed at the end. If all repositories were synced successfully, this
+    will also update the local labels file.
+    """
+    from labels.executor import execute
+    from labels.io import read_labels
+    from labels.plan import compute_plan
+
+    repositories = load_repositories(context, repos_file, org)
+    client = context.client
+
+    local_labels = read_labels(filename)
 
-        if remote_name in labels_to_ignore:
+    def sync_repository(
+        repository: "Repository",
+    ) -> typing.Tuple["Plan", typing.Dict[str, LabelsException]]:
+        plan = compute_plan(
+            local_labels,
+            client.list_labels(repository),
+            detect_renames=detect_renames,
+        )
+
+        if dryrun:
+            return plan, {}
+
+        return plan, apply_plan(client, repository, plan)
+
+    summary = {}
+    failed = False
+
+    for repository, result, error in execute(
+        in_context(sync_repository), repositories, jobs=jobs
+    ):
+        full_name = f"{repository.owner}/{repository.name}"
+
+        if result is None:
+            failed = True
+            summary[full_name] = f"failed - {error}"
             continue
 
-        labels_to_delete[remote_name] = remote_label
+        plan, failures = result
+        counts = (
+            f"{len(plan.delete)} to delete, "
+            f"{len(plan.update)} to update, "
+            f"{len(plan.create)} to create, "
+            f"{len(plan.ignore)} unchanged"
+        )
+
+        for label_error in failures.values():
+            failed = True
+            click.echo(f"{full_name}: {label_error}", err=True)
+
+        if failures:
+            counts += f", {len(failures)} failed"
+
+        summary[full_name] = counts
+
+    for full_name in sorted(summary):
+        click.echo(f"{full_name}: {summary[full_name]}")
+
+    if failed:
+        sys.exit(1)
 
     if dryrun:
-        # Do not modify remote labels, but only print info
-        dryrun_echo(
-            labels_to_delete, labels_to_update, labels_to_create, labels_to_ignore
+        return
+
+    # Make sure to update TOML sections of the local labels file
+    update_sections(filename, local_labels)
+
+
+@labels.command("plan")
+@click.pass_obj
+@click.option(
+    "-o",
+    "--owner",
+    help="GitHub owner name",
+    type=str,
+    default=default_owner,
+    required=True,
+)
+@click.option(
+    "-r",
+    "--repo",
+    help="GitHub repository name",
+    type=str,
+    default=default_repo,
+    required=True,
+)
+@click.option(
+    "-f",
+    "--filename",
+    help="Filename for labels",
+    default="labels.toml",
+    type=click.Path(exists=True),
+    required=True,
+)
+@click.option(
+    "-p",
+    "--plan-file",
+    help="Filename for the plan",
+    default="labels-plan.toml",
+    type=click.Path(),
+    required=True,
+)
+@click.option(
+    "--detect-renames",
+    help="Turn matching deletes and creates into renames",
+    is_flag=True,
+)
+def plan_cmd(
+    context: LabelsContext,
+    owner: str,
+    repo: str,
+    filename: str,
+    plan_file: str,
+    detect_renames: bool,
+) -> None:
+    """Plan to sync labels with a GitHub repository.
+
+    This will write the changes that sync would make to the specified plan
+    file, along with the state of the remote labels, and print them like
+    the dryrun option of sync.
+    """
+    from labels.github import Repository
+    from labels.io import read_labels, write_plan
+    from labels.plan import compute_plan
+
+    local_labels = read_labels(filename)
+
+    repository = Repository(owner, repo)
+
+    try:
+        remote_labels, pages = context.client.list_labels_with_pages(repository)
+        plan = compute_plan(
+            local_labels, remote_labels, detect_renames=detect_renames
         )
-        sys.exit(0)
+    except LabelsException as exc:
+        click.echo(str(exc), err=True)
+        sys.exit(1)
 
-    failures = []
+    write_plan(plan_file, repository, plan, pages)
 
-    for name in labels_to_delete.keys():
-        try:
-            context.client.delete_label(repository, name=name)
-        except LabelsException as exc:
-            click.echo(str(exc), err=True)
-            failures.append(name)
+    dryrun_echo(plan)
 
-    for name, label in labels_to_update.items():
-        try:
-            context.client.edit_label(repository, name=name, label=label)
-        except LabelsException as exc:
-            click.echo(str(exc), err=True)
-            failures.append(name)
 
-    for name, label in labels_to_create.items():
-        try:
-            context.client.create_label(repository, label=label)
-        except LabelsException as exc:
-            click.echo(str(exc), err=True)
-            failures.append(name)
+@labels.command("apply")
+@click.pass_obj
+@click.option(
+    "-p",
+    "--plan-file",
+    help="Filename for the plan",
+    default="labels-plan.toml",
+    type=click.Path(exists=True),
+    required=True,
+)
+@click.option(
+    "-f",
+    "--filename",
+    help="Filename for labels",
+    default="labels.toml",
+    type=click.Path(exists=True),
+    required=True,
+)
+@click.option(
+    "-j",
+    "--jobs",
+    help="Number of concurrent requests",
+    default=1,
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+def apply_cmd(
+    context: LabelsContext, plan_file: str, filename: str, jobs: int
+) -> None:
+    """Apply a plan created with the plan command.
+
+    The remote labels are not listed again. Instead this checks that they
+    did not change since the plan was created and refuses to apply the plan
+    otherwise. On success this will also update the local labels file, so
+    that section names match the `name` parameter.
+    """
+    from labels.io import read_labels, read_plan
+
+    repository, plan, pages = read_plan(plan_file)
+
+    try:
+        changed = context.client.pages_changed(pages)
+    except LabelsException as exc:
+        click.echo(str(exc), err=True)
+        sys.exit(1)
+
+    if changed:
+        click.echo(
+            f"The labels of {repository.owner}/{repository.name} changed since "
+            f"the plan was created. Please create a new plan.",
+            err=True,
+        )
+        sys.exit(1)
+
+    failures = apply_plan(context.client, repository, plan, jobs=jobs)
+
+    for error in failures.values():
+        click.echo(str(error), err=True)
 
     if failures:
         sys.exit(1)
 
-    # Make sure to write the local labels file to update TOML sections
-    write_labels(
-        filename,
-        sorted(
-            local_labels.values(),
-            key=operator.attrgetter("name", "description", "color"),
-        ),
-    )
+    local_labels = read_labels(filename)
 
+    # Make sure to update TOML sections of the local labels file
+    update_sections(filename, local_labels)
 
-def dryrun_echo(
-    labels_to_delete: Labels_Dict,
-    labels_to_update: Labels_Dict,
-    labels_to_create: Labels_Dict,
-    labels_to_ignore: Labels_Dict,
-) -> None:
+
+def update_sections(filename: str, local_labels: Labels_Dict) -> None:
+    """Rename sections of the labels file that do not match the name
+    parameter of their label, which leaves the file untouched otherwise.
+    """
+    from labels.io import rename_sections
+
+    renames = {
+        section: label.name
+        for section, label in local_labels.items()
+        if section != label.name
+    }
+
+    try:
+        rename_sections(filename, renames)
+    except ValueError as exc:
+        click.echo(f"Unable to update {filename}: {exc}", err=True)
+        sys.exit(1)
+
+
+def load_repositories(
+    context: LabelsContext, repos_file: typing.Optional[str], org: typing.Optional[str]
+) -> typing.List["Repository"]:
+    """Load repositories from a file or list the repositories of an org."""
+    from labels import utils
+
+    if (repos_file is None) == (org is None):
+        raise click.UsageError("Use exactly one of --repos-file and --org.")
+
+    try:
+        if repos_file is not None:
+            return utils.read_repositories(repos_file)
+        return context.client.list_repositories(typing.cast(str, org))
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--repos-file")
+    except LabelsException as exc:
+        click.echo(str(exc), err=True)
+        sys.exit(1)
+
+
+def in_context(func: typing.Callable[[T], R]) -> typing.Callable[[T], R]:
+    """Wrap func to run with the current click context.
+
+    The click context is thread-local, so this makes it available to functions
+    that are called from worker threads, such as the logging filter.
+    """
+    ctx = click.get_current_context()
+
+    def wrapper(item: T) -> R:
+        with ctx.scope(cleanup=False):
+            return func(item)
+
+    return wrapper
+
+
+def apply_plan(
+    client: "Client", repository: "Repository", plan: "Plan", *, jobs: int = 1
+) -> typing.Dict[str, LabelsException]:
+    """Modify remote labels and return the errors by name of the label.
+
+    Labels are deleted first, then updated and then created. Within each of
+    these steps up to the given number of jobs requests run concurrently.
+    """
+    from labels.executor import execute
+
+    def delete(name: str) -> None:
+        client.delete_label(repository, name=name)
+
+    def update(name: str) -> "Label":
+        return client.edit_label(repository, name=name, label=plan.update[name])
+
+    def create(name: str) -> "Label":
+        return client.create_label(repository, label=plan.create[name])
+
+    steps: typing.List[typing.Tuple[typing.Callable[[str], typing.Any], Labels_Dict]]
+    steps = [(delete, plan.delete), (update, plan.update), (create, plan.create)]
+
+    failures = {}
+
+    for func, labels_dict in steps:
+        for name, _, exc in execute(in_context(func), labels_dict, jobs=jobs):
+            if exc is not None:
+                failures[name] = exc
+
+    return failures
+
+
+def dryrun_echo(plan: "Plan") -> None:
     """Print information about how labels would be updated on sync."""
 
-    if labels_to_delete:
+    if plan.delete:
         click.echo("This would delete the following labels:")
-        for name in labels_to_delete:
+        for name in plan.delete:
             click.echo(f"  - {name}")
 
-    if labels_to_update:
+    if plan.update:
         click.echo("This would update the following labels:")
-        for name in labels_to_update:
+        for name in plan.update:
             click.echo(f"  - {name}")
 
-    if labels_to_create:
+    if plan.create:
         click.echo("This would create the following labels:")
-        for name in labels_to_create:
+        for name in plan.create:
             click.echo(f"  - {name}")
 
-    if labels_to_ignore:
+    if plan.ignore:
         click.echo("This would NOT modify the following labels:")
-        for name in labels_to_ignore:
+        for name in plan.ignore:
             click.echo(f"  - {name}")
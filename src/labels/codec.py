@@ -0,0 +1,40 @@
+import json
+from typing import Any, Callable
+
+import attr
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class JSONCodec:
+    """Functions to encode API payloads to JSON and to decode JSON."""
+
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+def stdlib_dumps(obj: Any) -> bytes:
+    """Encode obj to JSON with the json module of the standard library."""
+    return json.dumps(obj).encode("utf-8")
+
+
+STDLIB_CODEC = JSONCodec(name="json", dumps=stdlib_dumps, loads=json.loads)
+
+
+def orjson_codec() -> JSONCodec:
+    """Return a codec that uses orjson, which requires the orjson package."""
+    import orjson
+
+    return JSONCodec(name="orjson", dumps=orjson.dumps, loads=orjson.loads)
+
+
+def default_codec() -> JSONCodec:
+    """Return the fastest available codec.
+
+    This uses orjson if it is installed, for example with the speedups extra,
+    and the json module of the standard library otherwise.
+    """
+    try:
+        return orjson_codec()
+    except ImportError:
+        return STDLIB_CODEC
@@ -7,3 +7,7 @@ class LabelsException(Exception):
 
 class GitHubException(LabelsException):
     """Exception for GitHub API related errors."""
+
+
+class PlanException(LabelsException):
+    """Exception for local labels that cannot be planned for sync."""
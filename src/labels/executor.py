@@ -0,0 +1,55 @@
+import concurrent.futures
+import itertools
+import typing
+
+from labels.exceptions import LabelsException
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
+
+Outcome = typing.Tuple[T, typing.Optional[R], typing.Optional[LabelsException]]
+
+
+def execute(
+    func: typing.Callable[[T], R], items: typing.Iterable[T], *, jobs: int = 1
+) -> typing.Iterator[Outcome]:
+    """Call func for every item and yield (item, result, error) tuples.
+
+    With jobs greater than 1, up to that many calls run at the same time in a
+    pool of worker threads and outcomes are yielded in order of completion.
+    Items are only taken from the iterable when a worker becomes available.
+
+    A LabelsException raised by func is yielded as the error for that item
+    rather than aborting the remaining calls.
+    """
+    if jobs < 2:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except LabelsException as exc:
+                yield item, None, exc
+        return
+
+    remaining = iter(items)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = {
+            executor.submit(func, item): item
+            for item in itertools.islice(remaining, jobs)
+        }
+
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+
+            for future in done:
+                item = pending.pop(future)
+
+                for next_item in itertools.islice(remaining, 1):
+                    pending[executor.submit(func, next_item)] = next_item
+
+                try:
+                    yield item, future.result(), None
+                except LabelsException as exc:
+                    yield item, None, exc
@@ -1,10 +1,30 @@
+import concurrent.futures
 import logging
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import urllib.parse
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import attr
 import requests
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE
 
+from labels.cache import HTTPCache, conditional_headers, update_headers
+from labels.codec import JSONCodec, default_codec
 from labels.exceptions import GitHubException
+from labels.ratelimit import RateLimiter
+from labels.transport import RetryPolicy, create_session
+
+# Timeouts in seconds for connecting to the API and for reading responses.
+DEFAULT_TIMEOUT = (10.0, 30.0)
+
+LABELS_QUERY = """
+  repo{index}: repository(owner: $owner{index}, name: $name{index}) {{
+    labels(first: $first, after: $cursor{index}) {{
+      nodes {{ id name color description isDefault }}
+      pageInfo {{ hasNextPage endCursor }}
+    }}
+  }}
+"""
 
 
 @attr.s(auto_attribs=True, frozen=True)
@@ -15,18 +35,42 @@ class Repository:
     name: str
 
 
-def not_read_only(attr: attr.Attribute, value: Any) -> bool:
-    """Filter for attr that checks for a leading underscore."""
-    return not attr.name.startswith("_")
+@attr.s(auto_attribs=True, frozen=True)
+class Page:
+    """Represents a page of API results with its ETag and Link header."""
 
+    url: str
+    etag: str
+    link: str = ""
 
-@attr.s(auto_attribs=True, frozen=True)
+
+# Parameters of a label that are sent to GitHub, in the order of attributes
+LABEL_PARAMS = ("color", "name", "description")
+
+
+def description_str(description: Optional[str]) -> str:
+    """Converter for attr that turns a missing description into an empty
+    string, as GitHub returns null for labels without a description.
+    """
+    return "" if description is None else description
+
+
+def names_tuple(names: Sequence[str]) -> Tuple[str, ...]:
+    """Converter for attr that turns a sequence of names into a tuple."""
+    return tuple(names)
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True, cache_hash=True)
 class Label:
-    """Represents a GitHub issue label."""
+    """Represents a GitHub issue label.
+
+    Labels are slotted and compute their parameters and hash only once, as
+    syncing many repositories holds and compares a large number of them.
+    """
 
     color: str
     name: str
-    description: str = ""
+    description: str = attr.ib(default="", converter=description_str)
 
     # Read-only attributes
     _default: bool = False
@@ -34,71 +78,543 @@ class Label:
     _node_id: str = ""
     _url: str = ""
 
+    # Local attributes, which are not sent to GitHub
+    _previous_names: Tuple[str, ...] = attr.ib(default=(), converter=names_tuple)
+
+    # Cached label parameters, see __attrs_post_init__
+    _params: Tuple[str, str, str] = attr.ib(init=False, eq=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        # Frozen attrs classes do not allow to set attributes the usual way
+        object.__setattr__(self, "_params", (self.color, self.name, self.description))
+
+    @property
+    def previous_names(self) -> Tuple[str, ...]:
+        """Return names that the label had before it was renamed."""
+        return self._previous_names
+
     @property
     def params_dict(self) -> Dict[str, Any]:
         """Return label parameters as a dict."""
-        return attr.asdict(self, recurse=True, filter=not_read_only)
+        return dict(zip(LABEL_PARAMS, self._params))
 
     @property
     def params_tuple(self) -> Tuple[Any, ...]:
         """Return label parameters as a tuple."""
-        return attr.astuple(self, recurse=True, filter=not_read_only)
+        return self._params
+
+    def params_equal(self, other: "Label") -> bool:
+        """Return whether the label has the same parameters as other."""
+        return self._params == other._params
+
+
+class LabelPool:
+    """Flyweight pool for the parameters of labels.
+
+    Labels with the same color, name and description share a single copy of
+    these strings and of their parameter tuple, even if they are read from
+    different repositories. Only the read-only attributes, such as the id and
+    URL, are stored per label. A pool is safe to share between threads.
+    """
+
+    def __init__(self) -> None:
+        self._params: Dict[Tuple[str, str, str], Tuple[str, str, str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._params)
+
+    def label(self, **values: Any) -> Label:
+        """Return a Label for the given attributes with shared parameters."""
+        key = (
+            values["color"],
+            values["name"],
+            description_str(values.get("description")),
+        )
+
+        with self._lock:
+            params = self._params.setdefault(key, key)
+
+        color, name, description = params
+        values.update(color=color, name=name, description=description)
+        label = Label(**values)
+
+        # Replace the tuple that the label created with the shared one
+        object.__setattr__(label, "_params", params)
+        return label
+
+
+def page_urls(next_url: str, last_url: str) -> List[str]:
+    """Return the URLs for all pages from the next page to the last page.
+
+    GitHub API docs:
+    https://developer.github.com/v3/guides/traversing-with-pagination/
+    """
+    next_parts = urllib.parse.urlsplit(next_url)
+    next_query = urllib.parse.parse_qs(next_parts.query)
+    last_query = urllib.parse.parse_qs(urllib.parse.urlsplit(last_url).query)
+
+    try:
+        first_page = int(next_query["page"][0])
+        last_page = int(last_query["page"][0])
+    except (KeyError, ValueError):
+        return []
+
+    urls = []
+
+    for page in range(first_page, last_page + 1):
+        next_query["page"] = [str(page)]
+        query = urllib.parse.urlencode(next_query, doseq=True)
+        urls.append(urllib.parse.urlunsplit(next_parts._replace(query=query)))
+
+    return urls
 
 
 class Client:
+    """Client for the labels endpoints of the GitHub API.
+
+    By default each client creates its own session with a pool of connections
+    configured by the retries and pool arguments. Pass a session created by
+    labels.transport.create_session() instead to share connections between
+    clients. Pass a LabelPool to share the parameters of identical labels
+    across repositories when reading the labels of many repositories.
+    Payloads are encoded and decoded with the given JSON codec, which
+    defaults to the fastest one available.
+    """
+
+    auth: requests.auth.AuthBase
     base_url: str
+    graphql_url: str
+    per_page: int
+    timeout: Optional[Tuple[float, float]]
+    cache: Optional[HTTPCache]
+    rate_limiter: RateLimiter
     session: requests.Session
+    label_pool: Optional[LabelPool]
+    json_codec: JSONCodec
 
     def __init__(
-        self, auth: requests.auth.AuthBase, base_url: str = "https://api.github.com"
+        self,
+        auth: requests.auth.AuthBase,
+        base_url: str = "https://api.github.com",
+        *,
+        per_page: int = 100,
+        cache: Optional[HTTPCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retries: Optional[RetryPolicy] = None,
+        timeout: Optional[Tuple[float, float]] = DEFAULT_TIMEOUT,
+        session: Optional[requests.Session] = None,
+        pool_connections: int = DEFAULT_POOLSIZE,
+        pool_maxsize: int = DEFAULT_POOLSIZE,
+        pool_block: bool = DEFAULT_POOLBLOCK,
+        graphql_url: Optional[str] = None,
+        label_pool: Optional[LabelPool] = None,
+        json_codec: Optional[JSONCodec] = None,
     ) -> None:
+        self.auth = auth
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.auth = auth
+        self.graphql_url = (
+            f"{base_url}/graphql" if graphql_url is None else graphql_url
+        )
+        self.per_page = per_page
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = RateLimiter() if rate_limiter is None else rate_limiter
+        self.label_pool = label_pool
+        self.json_codec = default_codec() if json_codec is None else json_codec
+
+        if session is None:
+            session = create_session(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
+                retries=retries,
+            )
+
+        self.session = session
 
-    def list_labels(self, repo: Repository) -> List[Label]:
+    def _label(self, **values: Any) -> Label:
+        """Return a Label for the given attributes, taking its parameters
+        from the label pool of the client, if it has one.
+        """
+        if self.label_pool is None:
+            return Label(**values)
+        return self.label_pool.label(**values)
+
+    def _decode(self, response: requests.Response) -> Any:
+        """Return the decoded JSON body of the response."""
+        return self.json_codec.loads(response.content)
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request, pacing and retrying it according to the rate limit.
+
+        Transient errors are retried by the transport adapter according to the
+        retry policy of the session.
+        """
+        kwargs.setdefault("auth", self.auth)
+        kwargs.setdefault("timeout", self.timeout)
+
+        if "json" in kwargs:
+            kwargs["data"] = self.json_codec.dumps(kwargs.pop("json"))
+            kwargs["headers"] = {
+                **kwargs.get("headers", {}),
+                "Content-Type": "application/json",
+            }
+
+        logger = logging.getLogger("labels")
+        attempt = 0
+
+        while True:
+            self.rate_limiter.wait()
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as exc:
+                raise GitHubException(f"Error sending request: {exc}") from exc
+
+            retries = getattr(response.raw, "retries", None)
+            if retries is not None and retries.history:
+                logger.debug(
+                    f"Retried {method} {url} {len(retries.history)} times "
+                    f"before receiving {response.status_code}"
+                )
+
+            self.rate_limiter.update(response)
+
+            if attempt >= self.rate_limiter.retries:
+                return response
+
+            if not self.rate_limiter.backoff(response):
+                return response
+
+            attempt += 1
+
+            logger.debug(f"Rate limit exceeded, retrying {method} {url}")
+
+    def list_labels(self, repo: Repository, *, jobs: int = 1) -> List[Label]:
         """Return the list of Labels from the repository.
 
+        Labels are requested in pages of per_page labels. GitHub includes
+        the page size in the links to the following pages. With jobs greater
+        than 1, the remaining pages are requested concurrently once the first
+        response reveals the last page. If the client has a cache, pages are
+        requested conditionally and unchanged pages are loaded from the cache.
+
         GitHub API docs:
         https://developer.github.com/v3/issues/labels/#list-all-labels-for-this-repository
         """
+        return list(self.iter_labels(repo, jobs=jobs))
+
+    def iter_labels(self, repo: Repository, *, jobs: int = 1) -> Iterator[Label]:
+        """Yield the Labels from the repository as the pages arrive.
+
+        Every page is decoded once it is received and the labels on it are
+        yielded before the next page is requested, so that at most one page
+        is held in memory. With jobs greater than 1, pages that arrive early
+        are held until the pages before them have been yielded.
+
+        GitHub API docs:
+        https://developer.github.com/v3/issues/labels/#list-all-labels-for-this-repository
+        """
+        for response in self._iter_label_pages(repo, jobs=jobs):
+            for label in self._decode(response):
+                yield self._label(**label)
+
+    def list_labels_with_pages(
+        self, repo: Repository, *, jobs: int = 1
+    ) -> Tuple[List[Label], List[Page]]:
+        """Return the list of Labels from the repository and the Pages that
+        they were read from, which allow to check whether they changed later.
+        """
+        labels: List[Label] = []
+        pages: List[Page] = []
+
+        for response in self._iter_label_pages(repo, jobs=jobs):
+            labels.extend(self._label(**label) for label in self._decode(response))
+            pages.append(
+                Page(
+                    url=response.url,
+                    etag=response.headers.get("ETag", ""),
+                    link=response.headers.get("Link", ""),
+                )
+            )
+
+        return labels, pages
+
+    def pages_changed(self, pages: Sequence[Page]) -> bool:
+        """Return whether any of the pages changed since they were requested.
+
+        Every page is requested with its ETag, and GitHub does not count
+        unchanged pages, which it responds to with 304 Not Modified, against
+        the rate limit. As labels added to a new page after the last page do
+        not change the ETags, the pages also count as changed if their Link
+        headers changed or the last page links to a next page.
+        """
         logger = logging.getLogger("labels")
-        logger.debug(f"Requesting labels for {repo.owner}/{repo.name}")
 
-        headers = {"Accept": "application/vnd.github.symmetra-preview+json"}
+        for number, page in enumerate(pages, 1):
+            if not page.etag:
+                return True
 
-        response = self.session.get(
-            f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels", headers=headers
-        )
+            logger.debug(f"Checking for changes to {page.url}")
 
-        if response.status_code != 200:
-            raise GitHubException(
-                f"Error retrieving labels: "
-                f"{response.status_code} - "
-                f"{response.reason}"
+            response = self._request(
+                "GET",
+                page.url,
+                headers={
+                    "Accept": "application/vnd.github.symmetra-preview+json",
+                    "If-None-Match": page.etag,
+                },
             )
 
-        repo_labels: List[Dict] = response.json()
+            if response.status_code not in (200, 304):
+                raise GitHubException(
+                    f"Error checking labels: "
+                    f"{response.status_code} - "
+                    f"{response.reason}"
+                )
+
+            etag = response.headers.get("ETag")
+
+            if response.status_code == 200 and etag != page.etag:
+                return True
+
+            link = response.headers.get("Link")
+
+            if page.link and link is not None and link != page.link:
+                return True
+
+            if number == len(pages) and "next" in response.links:
+                return True
+
+        return False
+
+    def _iter_label_pages(
+        self, repo: Repository, *, jobs: int = 1
+    ) -> Iterator[requests.Response]:
+        """Request the pages of labels of the repository in order."""
+        logger = logging.getLogger("labels")
+        logger.debug(f"Requesting labels for {repo.owner}/{repo.name}")
+
+        response = self._get_page(
+            f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels",
+            params={"per_page": self.per_page},
+            error="Error retrieving labels",
+        )
+
+        yield response
 
         next_page: Optional[Dict] = response.links.get("next", None)
+        last_page: Optional[Dict] = response.links.get("last", None)
+
+        if jobs > 1 and next_page is not None and last_page is not None:
+            urls = page_urls(next_page["url"], last_page["url"])
+
+            if urls:
+                logger.debug(f"Requesting {len(urls)} more pages of labels")
+
+                with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as ex:
+                    yield from ex.map(self._get_page, urls)
+
+                return
 
         while next_page is not None:
 
             logger.debug("Requesting next page of labels")
-            response = self.session.get(next_page["url"], headers=headers)
+            response = self._get_page(next_page["url"])
+
+            yield response
+
+            next_page = response.links.get("next", None)
+
+    def list_repositories(self, org: str) -> List[Repository]:
+        """Return the repositories of an organization, except archived ones.
+
+        GitHub API docs:
+        https://docs.github.com/en/rest/repos/repos#list-organization-repositories
+        """
+        logger = logging.getLogger("labels")
+        logger.debug(f"Requesting repositories for {org}")
+
+        response = self._get_page(
+            f"{self.base_url}/orgs/{org}/repos",
+            params={"per_page": self.per_page},
+            error="Error retrieving repositories",
+        )
+
+        org_repos: List[Dict] = self._decode(response)
+
+        next_page: Optional[Dict] = response.links.get("next", None)
+
+        while next_page is not None:
+
+            logger.debug("Requesting next page of repositories")
+            response = self._get_page(
+                next_page["url"], error="Error retrieving next page of repositories"
+            )
+
+            org_repos.extend(self._decode(response))
+
+            next_page = response.links.get("next", None)
+
+        return [
+            Repository(repo["owner"]["login"], repo["name"])
+            for repo in org_repos
+            if not repo.get("archived", False)
+        ]
+
+    def list_labels_graphql(
+        self, repos: Sequence[Repository], *, batch_size: int = 20
+    ) -> Tuple[Dict[Repository, List[Label]], Dict[Repository, GitHubException]]:
+        """Return the Labels of many repositories using the GraphQL API.
+
+        Each query requests a page of labels for up to batch_size
+        repositories at once. Repositories with more labels than fit on a
+        page are requested again with their cursor in the next query. As the
+        GraphQL API does not expose label IDs, the Labels have an id of 0.
+
+        Return a dict mapping repositories to their Labels and a dict mapping
+        repositories whose labels could not be retrieved, for example because
+        they were deleted or renamed, to the corresponding exception. Raise a
+        GitHubException if a query fails as a whole.
+
+        GitHub API docs:
+        https://docs.github.com/en/graphql/reference/objects#repository
+        """
+        logger = logging.getLogger("labels")
+
+        repo_labels: Dict[Repository, List[Label]] = {repo: [] for repo in repos}
+        repo_errors: Dict[Repository, GitHubException] = {}
+        pending: List[Tuple[Repository, Optional[str]]] = [
+            (repo, None) for repo in repo_labels
+        ]
+
+        while pending:
+            batch, pending = pending[:batch_size], pending[batch_size:]
+
+            logger.debug(f"Requesting labels for {len(batch)} repositories")
+
+            declarations = ["$first: Int!"]
+            fields = []
+            variables: Dict[str, Any] = {"first": self.per_page}
+
+            for index, (repo, cursor) in enumerate(batch):
+                declarations.append(
+                    f"$owner{index}: String!, $name{index}: String!, "
+                    f"$cursor{index}: String"
+                )
+                fields.append(LABELS_QUERY.format(index=index))
+                variables.update(
+                    {
+                        f"owner{index}": repo.owner,
+                        f"name{index}": repo.name,
+                        f"cursor{index}": cursor,
+                    }
+                )
+
+            query = f"query({', '.join(declarations)}) {{{''.join(fields)}}}"
+
+            response = self._request(
+                "POST",
+                self.graphql_url,
+                json={"query": query, "variables": variables},
+            )
 
             if response.status_code != 200:
                 raise GitHubException(
-                    f"Error retrieving next page of labels: "
+                    f"Error retrieving labels: "
                     f"{response.status_code} - "
                     f"{response.reason}"
                 )
 
-            repo_labels.extend(response.json())
+            body: Dict[str, Any] = self._decode(response)
+            data = body.get("data") or {}
+            errors = body.get("errors") or []
+
+            # Errors for a repository have a path starting with its alias
+            alias_errors: Dict[Optional[str], List[str]] = {}
+            for error in errors:
+                path = error.get("path") or [None]
+                alias_errors.setdefault(path[0], []).append(error["message"])
+
+            for index, (repo, _) in enumerate(batch):
+                alias = f"repo{index}"
+                repository = data.get(alias)
+
+                if repository is None:
+                    messages = "; ".join(
+                        alias_errors.get(alias) or alias_errors.get(None) or []
+                    )
+                    repo_errors[repo] = GitHubException(
+                        f"Error retrieving labels for {repo.owner}/{repo.name}: "
+                        f"{messages or 'repository not found'}"
+                    )
+                    del repo_labels[repo]
+                    continue
+
+                labels = repository["labels"]
+
+                for node in labels["nodes"]:
+                    quoted_name = urllib.parse.quote(node["name"], safe="")
+                    repo_labels[repo].append(
+                        self._label(
+                            color=node["color"],
+                            name=node["name"],
+                            description=node["description"] or "",
+                            default=node["isDefault"],
+                            node_id=node["id"],
+                            url=(
+                                f"{self.base_url}/repos/{repo.owner}/{repo.name}"
+                                f"/labels/{quoted_name}"
+                            ),
+                        )
+                    )
+
+                if labels["pageInfo"]["hasNextPage"]:
+                    pending.append((repo, labels["pageInfo"]["endCursor"]))
+
+        return repo_labels, repo_errors
+
+    def _get_page(
+        self,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        error: str = "Error retrieving next page of labels",
+    ) -> requests.Response:
+        """Request a page of results, revalidating a cached page if possible."""
+        headers = {"Accept": "application/vnd.github.symmetra-preview+json"}
 
-            next_page = response.links.get("next", None)
+        cached = None
+
+        if self.cache is not None:
+            url = requests.Request("GET", url, params=params).prepare().url or url
+            params = None
+            cached = self.cache.get(url)
+
+        if cached is not None:
+            headers.update(conditional_headers(cached))
+
+        response = self._request("GET", url, headers=headers, params=params)
+
+        if response.status_code == 304 and cached is not None:
+            logger = logging.getLogger("labels")
+            logger.debug(f"Using cached response for {url}")
+
+            if update_headers(cached, response) and self.cache is not None:
+                self.cache.set(url, cached)
+
+            return cached
+
+        if response.status_code != 200:
+            raise GitHubException(
+                f"{error}: {response.status_code} - {response.reason}"
+            )
+
+        if self.cache is not None:
+            self.cache.set(url, response)
 
-        return [Label(**label) for label in repo_labels]
+        return response
 
     def get_label(self, repo: Repository, *, name: str) -> Label:
         """Return a single Label from the repository.
@@ -109,7 +625,8 @@ class Client:
         logger = logging.getLogger("labels")
         logger.debug(f"Requesting label '{name}' for {repo.owner}/{repo.name}")
 
-        response = self.session.get(
+        response = self._request(
+            "GET",
             f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels/{name}",
             headers={"Accept": "application/vnd.github.symmetra-preview+json"},
         )
@@ -121,7 +638,7 @@ class Client:
                 f"{response.reason}"
             )
 
-        return Label(**response.json())
+        return self._label(**self._decode(response))
 
     def create_label(self, repo: Repository, *, label: Label) -> Label:
         """Create a new Label for the repository.
@@ -132,7 +649,8 @@ class Client:
         logger = logging.getLogger("labels")
         logger.debug(f"Creating label '{label.name}' for {repo.owner}/{repo.name}")
 
-        response = self.session.post(
+        response = self._request(
+            "POST",
             f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels",
             headers={"Accept": "application/vnd.github.symmetra-preview+json"},
             json=label.params_dict,
@@ -145,7 +663,7 @@ class Client:
                 f"{response.reason}"
             )
 
-        return Label(**response.json())
+        return self._label(**self._decode(response))
 
     def edit_label(self, repo: Repository, *, name: str, label: Label) -> Label:
         """Update a GitHub issue label.
@@ -156,7 +674,8 @@ class Client:
         logger = logging.getLogger("labels")
         logger.debug(f"Editing label '{name}' for {repo.owner}/{repo.name}")
 
-        response = self.session.patch(
+        response = self._request(
+            "PATCH",
             f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels/{name}",
             headers={"Accept": "application/vnd.github.symmetra-preview+json"},
             json=label.params_dict,
@@ -169,7 +688,7 @@ class Client:
                 f"{response.reason}"
             )
 
-        return Label(**response.json())
+        return self._label(**self._decode(response))
 
     def delete_label(self, repo: Repository, *, name: str) -> None:
         """Delete a GitHub issue label.
@@ -180,7 +699,8 @@ class Client:
         logger = logging.getLogger("labels")
         logger.debug(f"Deleting label '{name}' for {repo.owner}/{repo.name}")
 
-        response = self.session.delete(
+        response = self._request(
+            "DELETE",
             f"{self.base_url}/repos/{repo.owner}/{repo.name}/labels/{name}"
         )
 
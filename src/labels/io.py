@@ -1,29 +1,595 @@
+import abc
+import functools
+import itertools
 import logging
+import mmap
+import os
+import re
+import stat
+import tempfile
+import types
 import typing
 
 import tomli
 import tomli_w
 
-from labels.github import Label
+from labels import binary
+from labels.github import Label, Page, Repository
+from labels.plan import Plan
+from labels.state import RemoteState
 
+# Files with this extension use the binary format instead of TOML
+BINARY_EXTENSION = ".bin"
 
-def write_labels(filename: str, labels: typing.List[Label]) -> None:
-    """Dump labels to the given TOML file."""
+
+# Number of parsed labels files that read_labels_cached() keeps in memory
+READ_CACHE_SIZE = 32
+
+# Table header with a bare key, which does not need to be parsed as TOML
+BARE_HEADER = re.compile(rb"\[([A-Za-z0-9_-]+)\]")
+
+V = typing.TypeVar("V")
+
+
+def is_binary(filename: str) -> bool:
+    """Return whether the file uses the binary format based on its name."""
+    return os.path.splitext(filename)[1] == BINARY_EXTENSION
+
+
+def write_labels(filename: str, labels: typing.Iterable[Label]) -> bool:
+    """Dump labels to the given TOML or binary file.
+
+    Labels are streamed to a temporary file, which then atomically replaces
+    the given file, unless the content did not change. Return whether the
+    file was written.
+    """
     logger = logging.getLogger("labels")
     logger.debug(f"Writing labels to {filename}")
 
-    obj = {label.name: label.params_dict for label in labels}
+    if is_binary(filename):
+        chunks: typing.Iterable[bytes] = [
+            binary.MAGIC,
+            binary.encode_entry(
+                "", {label.name: label for label in unique_labels(labels)}
+            ),
+        ]
+    else:
+        chunks = iter_toml_labels(labels)
+
+    written = write_atomic(filename, chunks)
+
+    if not written:
+        logger.debug(f"Labels in {filename} are unchanged")
+
+    return written
+
+
+def rename_sections(filename: str, renames: typing.Mapping[str, str]) -> bool:
+    """Rename sections of the given labels file and return whether the file
+    was written.
+
+    Only the header lines of the renamed sections of a TOML file are
+    rewritten, which keeps the order, formatting and comments of the file.
+    If the headers cannot be found, for example for inline tables, the whole
+    file is rewritten instead. Raise a ValueError if a new name is used by
+    another section or for more than one section.
+    """
+    if not renames:
+        return False
+
+    logger = logging.getLogger("labels")
+    logger.debug(f"Renaming {len(renames)} sections of {filename}")
+
+    if is_binary(filename):
+        return write_labels(filename, read_labels(filename).values())
+
+    with open(filename, "rb") as labels_file:
+        data = labels_file.read()
+
+    obj = tomli.loads(data.decode("utf-8"))
+    renamed = {renames.get(section, section): values for section, values in obj.items()}
+
+    if len(renamed) != len(obj):
+        names = [renames.get(section, section) for section in obj]
+        duplicate = next(name for name in names if names.count(name) > 1)
+        raise ValueError(f'Duplicate label name: "{duplicate}"')
+
+    try:
+        content = rename_headers(filename, data, renames)
+        in_place = tomli.loads(content.decode("utf-8")) == renamed
+    except (KeyError, ValueError):
+        in_place = False
+
+    if not in_place:
+        logger.debug(f"Unable to rename sections in place, rewriting {filename}")
+        content = tomli_w.dumps(renamed).encode("utf-8")
+
+    return write_atomic(filename, [content])
+
+
+def rename_headers(
+    filename: str, data: bytes, renames: typing.Mapping[str, str]
+) -> bytes:
+    """Return the data with the header lines of the renamed sections replaced.
+
+    Raise a KeyError if a section has no header line at the start of a line,
+    or a ValueError if the headers of the file cannot be indexed.
+    """
+    with LazyLabels(filename) as sections:
+        offsets = sorted((sections.header_offset(name), name) for name in renames)
+
+    chunks = []
+    position = 0
+
+    for start, name in offsets:
+        header_end = data.find(b"\n", start)
+        chunks.append(data[position:start])
+        chunks.append(tomli_w.dumps({renames[name]: {}}).encode("utf-8"))
+        position = len(data) if header_end == -1 else header_end + 1
+
+    chunks.append(data[position:])
+
+    return b"".join(chunks)
+
+
+def unique_labels(labels: typing.Iterable[Label]) -> typing.Iterator[Label]:
+    """Yield the labels one after another.
+
+    Raise a ValueError for labels with the same name, which cannot be
+    represented as sections of the same labels file.
+    """
+    names: typing.Set[str] = set()
+
+    for label in labels:
+        if label.name in names:
+            raise ValueError(f'Duplicate label name: "{label.name}"')
 
-    with open(filename, "wb") as labels_file:
-        tomli_w.dump(obj, labels_file)
+        names.add(label.name)
+        yield label
+
+
+def iter_toml_labels(labels: typing.Iterable[Label]) -> typing.Iterator[bytes]:
+    """Yield the TOML tables for the labels one after another.
+
+    Raise a ValueError for labels with the same name.
+    """
+    for index, label in enumerate(unique_labels(labels)):
+        obj = label.params_dict
+        if label.previous_names:
+            obj["previous_names"] = list(label.previous_names)
+
+        table = tomli_w.dumps({label.name: obj}).encode("utf-8")
+        yield table if index == 0 else b"\n" + table
+
+
+def write_atomic(filename: str, chunks: typing.Iterable[bytes]) -> bool:
+    """Write the chunks to a temporary file, which then replaces the given
+    file, unless it has the same content. Return whether the file was
+    replaced.
+
+    The chunks are compared with the content of the file as they are
+    generated, and the temporary file is only created once they differ, so
+    that nothing is written for unchanged content.
+    """
+    try:
+        existing_file = open(filename, "rb")
+    except FileNotFoundError:
+        temp_path = write_temp_file(filename, chunks)
+    else:
+        with existing_file:
+            content = changed_content(existing_file, chunks)
+            if content is None:
+                return False
+            temp_path = write_temp_file(filename, content)
+
+    try:
+        os.chmod(temp_path, file_mode(filename))
+        os.replace(temp_path, filename)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    return True
+
+
+def changed_content(
+    existing_file: typing.BinaryIO, chunks: typing.Iterable[bytes]
+) -> typing.Optional[typing.Iterator[bytes]]:
+    """Return None if the chunks have the same content as the open file, and
+    an iterator over the content of the chunks otherwise.
+
+    The content that matches the start of the file is not kept in memory,
+    but read from the file again by the returned iterator.
+    """
+    remaining = iter(chunks)
+    matched = 0
+
+    for chunk in remaining:
+        if existing_file.read(len(chunk)) != chunk:
+            break
+        matched += len(chunk)
+    else:
+        if not existing_file.read(1):
+            return None
+        chunk = b""
+
+    return itertools.chain(read_start(existing_file, matched), [chunk], remaining)
+
+
+def read_start(binary_file: typing.BinaryIO, size: int) -> typing.Iterator[bytes]:
+    """Yield the first size bytes of the open file in blocks."""
+    binary_file.seek(0)
+
+    while size > 0:
+        block = binary_file.read(min(size, 65536))
+        if not block:
+            return
+        size -= len(block)
+        yield block
+
+
+def write_temp_file(filename: str, chunks: typing.Iterable[bytes]) -> str:
+    """Write the chunks to a new temporary file in the directory of the given
+    file and return its path.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(file_descriptor, "wb") as temp_file:
+            for chunk in chunks:
+                temp_file.write(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    return temp_path
+
+
+def file_mode(filename: str) -> int:
+    """Return the permissions of the file, or the default permissions for
+    new files if it does not exist.
+    """
+    try:
+        return stat.S_IMODE(os.stat(filename).st_mode)
+    except FileNotFoundError:
+        # The umask can only be read by setting it
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
 
 
 def read_labels(filename: str) -> typing.Dict[str, Label]:
-    """Load labels from the given TOML file."""
+    """Load labels from the given TOML or binary file."""
     logger = logging.getLogger("labels")
     logger.debug(f"Reading labels from {filename}")
 
+    if is_binary(filename):
+        with open(filename, "rb") as binary_file:
+            entries = binary.read_entries(binary_file.read())
+            return {
+                name: label
+                for _, _, labels in entries
+                for name, label in labels.items()
+            }
+
     with open(filename, "rb") as labels_file:
         obj = tomli.load(labels_file)
 
     return {name: Label(**values) for name, values in obj.items()}
+
+
+def read_labels_cached(filename: str) -> typing.Mapping[str, Label]:
+    """Load labels from the given TOML or binary file, reusing the labels
+    from a previous call if the file did not change since.
+
+    Files are considered unchanged if they have the same modification time
+    and size. The least recently used files are evicted from the cache once
+    it holds READ_CACHE_SIZE files. As the returned mapping is shared between
+    calls, it is read-only.
+    """
+    stat_result = os.stat(filename)
+    return load_labels_cached(
+        os.path.abspath(filename), stat_result.st_mtime_ns, stat_result.st_size
+    )
+
+
+@functools.lru_cache(maxsize=READ_CACHE_SIZE)
+def load_labels_cached(
+    path: str, mtime_ns: int, size: int
+) -> typing.Mapping[str, Label]:
+    """Load labels for read_labels_cached(), which passes the modification
+    time and size of the file to distinguish versions of it.
+    """
+    return types.MappingProxyType(read_labels(path))
+
+
+def write_snapshot_entry(
+    snapshot_file: typing.BinaryIO,
+    repository: Repository,
+    labels: typing.Iterable[Label],
+    *,
+    binary_format: bool = False,
+) -> None:
+    """Append the labels of a repository to an open TOML or binary snapshot
+    file.
+
+    Snapshots map "owner/name" keys to tables of labels, so that entries for
+    many repositories can be written one after another.
+    """
+    key = f"{repository.owner}/{repository.name}"
+
+    if binary_format:
+        binary.write_entry(snapshot_file, key, {label.name: label for label in labels})
+        return
+
+    obj = {key: {label.name: label.params_dict for label in labels}}
+
+    if snapshot_file.tell() > 0:
+        snapshot_file.write(b"\n")
+
+    snapshot_file.write(tomli_w.dumps(obj).encode("utf-8"))
+
+
+def read_snapshot(filename: str) -> typing.Dict[str, typing.Dict[str, Label]]:
+    """Load the labels of many repositories from the given TOML or binary
+    snapshot.
+    """
+    logger = logging.getLogger("labels")
+    logger.debug(f"Reading snapshot from {filename}")
+
+    if is_binary(filename):
+        with open(filename, "rb") as binary_file:
+            entries = binary.read_entries(binary_file.read())
+            return {key: labels for key, _, labels in entries}
+
+    with open(filename, "rb") as snapshot_file:
+        obj = tomli.load(snapshot_file)
+
+    return {
+        key: {name: Label(**values) for name, values in labels.items()}
+        for key, labels in obj.items()
+    }
+
+
+def write_plan(
+    filename: str,
+    repository: Repository,
+    plan: Plan,
+    pages: typing.Iterable[Page],
+) -> None:
+    """Dump a sync plan and the remote pages it is based on to a TOML file."""
+    logger = logging.getLogger("labels")
+    logger.debug(f"Writing plan to {filename}")
+
+    obj = {
+        "repository": {"owner": repository.owner, "name": repository.name},
+        "pages": [
+            {"url": page.url, "etag": page.etag, "link": page.link} for page in pages
+        ],
+        "delete": {name: label.params_dict for name, label in plan.delete.items()},
+        "update": {name: label.params_dict for name, label in plan.update.items()},
+        "create": {name: label.params_dict for name, label in plan.create.items()},
+        "ignore": {name: label.params_dict for name, label in plan.ignore.items()},
+    }
+
+    with open(filename, "wb") as plan_file:
+        tomli_w.dump(obj, plan_file)
+
+
+def read_plan(filename: str) -> typing.Tuple[Repository, Plan, typing.List[Page]]:
+    """Load a sync plan and the remote pages it is based on from a TOML file."""
+    logger = logging.getLogger("labels")
+    logger.debug(f"Reading plan from {filename}")
+
+    with open(filename, "rb") as plan_file:
+        obj = tomli.load(plan_file)
+
+    repository = Repository(**obj["repository"])
+    plan = Plan(
+        **{
+            action: {name: Label(**values) for name, values in obj[action].items()}
+            for action in ("delete", "update", "create", "ignore")
+        }
+    )
+    pages = [Page(**page) for page in obj["pages"]]
+
+    return repository, plan, pages
+
+
+def write_state(
+    filename: str, states: typing.Mapping[Repository, RemoteState]
+) -> None:
+    """Dump the remote state of repositories as of the last sync to a TOML
+    or binary file.
+    """
+    logger = logging.getLogger("labels")
+    logger.debug(f"Writing state to {filename}")
+
+    if is_binary(filename):
+        with open(filename, "wb") as binary_file:
+            for repository, state in states.items():
+                binary.write_entry(
+                    binary_file,
+                    f"{repository.owner}/{repository.name}",
+                    {label.name: label for label in state.labels},
+                    state.pages,
+                )
+        return
+
+    obj = {
+        f"{repository.owner}/{repository.name}": {
+            "pages": [
+                {"url": page.url, "etag": page.etag, "link": page.link}
+                for page in state.pages
+            ],
+            "labels": {label.name: label.params_dict for label in state.labels},
+        }
+        for repository, state in states.items()
+    }
+
+    with open(filename, "wb") as state_file:
+        tomli_w.dump(obj, state_file)
+
+
+def read_state(filename: str) -> typing.Dict[Repository, RemoteState]:
+    """Load the remote state of repositories as of the last sync from a TOML
+    or binary file, which may not exist yet.
+    """
+    if not os.path.exists(filename):
+        return {}
+
+    logger = logging.getLogger("labels")
+    logger.debug(f"Reading state from {filename}")
+
+    states = {}
+
+    if is_binary(filename):
+        with open(filename, "rb") as binary_file:
+            for key, pages, labels in binary.read_entries(binary_file.read()):
+                owner, name = key.split("/", 1)
+                states[Repository(owner, name)] = RemoteState(
+                    labels=list(labels.values()), pages=pages
+                )
+        return states
+
+    with open(filename, "rb") as state_file:
+        obj = tomli.load(state_file)
+
+    for key, values in obj.items():
+        owner, name = key.split("/", 1)
+        states[Repository(owner, name)] = RemoteState(
+            labels=[Label(**label) for label in values["labels"].values()],
+            pages=[Page(**page) for page in values["pages"]],
+        )
+
+    return states
+
+
+def header_offsets(data: mmap.mmap) -> typing.Iterator[int]:
+    """Yield the offsets of lines in the data that start with "["."""
+    if data[:1] == b"[":
+        yield 0
+
+    position = data.find(b"\n[")
+
+    while position != -1:
+        yield position + 1
+        position = data.find(b"\n[", position + 1)
+
+
+class LazyTables(typing.Mapping[str, V]):
+    """Read-only mapping of the top-level tables of a TOML file, which are
+    only parsed when they are accessed.
+
+    The file is memory-mapped and scanned once for table headers at the
+    start of a line, which results in an index of the offsets of the tables
+    by their top-level key. Tables are expected to be contiguous, as in files
+    written by labels, and lines in multi-line strings must not start with a
+    table header. Close the mapping or use it as a context manager to unmap
+    the file.
+    """
+
+    def __init__(self, filename: str) -> None:
+        logger = logging.getLogger("labels")
+        logger.debug(f"Indexing tables of {filename}")
+
+        with open(filename, "rb") as toml_file:
+            if os.fstat(toml_file.fileno()).st_size == 0:
+                self._data: typing.Optional[mmap.mmap] = None
+            else:
+                self._data = mmap.mmap(
+                    toml_file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+
+        self._index: typing.Dict[str, typing.Tuple[int, int]] = {}
+        self._tables: typing.Dict[str, V] = {}
+
+        if self._data is not None:
+            self._build_index(self._data)
+
+    def _build_index(self, data: mmap.mmap) -> None:
+        starts = list(header_offsets(data))
+        ends = starts[1:] + [len(data)]
+        key = None
+
+        for start, end in zip(starts, ends):
+            header_end = data.find(b"\n", start, end)
+            header = data[start:end] if header_end == -1 else data[start:header_end]
+            match = BARE_HEADER.fullmatch(header.rstrip())
+
+            if match is not None:
+                next_key = match.group(1).decode("utf-8")
+            else:
+                next_key = next(iter(tomli.loads(header.decode("utf-8"))))
+
+            if next_key == key:
+                # Extend the index entry to all of the sub-tables of the key
+                self._index[next_key] = (self._index[next_key][0], end)
+            else:
+                key = next_key
+                self._index[key] = (start, end)
+
+    @abc.abstractmethod
+    def _load(self, key: str, values: typing.Any) -> V:
+        """Return the value for the parsed table of the key."""
+
+    def header_offset(self, key: str) -> int:
+        """Return the offset of the header line of the table of the key.
+
+        Raise a KeyError if the file has no table for the key.
+        """
+        return self._index[key][0]
+
+    def __getitem__(self, key: str) -> V:
+        if key not in self._tables:
+            start, end = self._index[key]
+
+            if self._data is None:
+                raise ValueError("Cannot read tables from a closed file")
+
+            obj = tomli.loads(self._data[start:end].decode("utf-8"))
+            self._tables[key] = self._load(key, obj[key])
+
+        return self._tables[key]
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        """Unmap the file."""
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+    def __enter__(self) -> "LazyTables[V]":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+
+class LazyLabels(LazyTables[Label]):
+    """Labels of a TOML labels file, which are parsed when they are accessed.
+
+    This is a drop-in replacement for the dict that read_labels() returns.
+    """
+
+    def _load(self, key: str, values: typing.Any) -> Label:
+        return Label(**values)
+
+
+class LazySnapshot(LazyTables[typing.Dict[str, Label]]):
+    """Labels of repositories in a TOML snapshot, which are parsed when they
+    are accessed.
+
+    This is a drop-in replacement for the dict that read_snapshot() returns.
+    """
+
+    def _load(self, key: str, values: typing.Any) -> typing.Dict[str, Label]:
+        return {name: Label(**label) for name, label in values.items()}
@@ -0,0 +1,110 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+import attr
+
+from labels.exceptions import PlanException
+from labels.github import Label
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Plan:
+    """Changes that make the remote labels match the local labels.
+
+    All mappings are keyed by the current name of the remote label, except
+    for labels to create, which are keyed by their new name.
+    """
+
+    delete: Dict[str, Label] = attr.ib(factory=dict)
+    update: Dict[str, Label] = attr.ib(factory=dict)
+    create: Dict[str, Label] = attr.ib(factory=dict)
+    ignore: Dict[str, Label] = attr.ib(factory=dict)
+
+    @property
+    def changed(self) -> bool:
+        """Return whether applying the plan modifies any remote labels."""
+        return bool(self.delete or self.update or self.create)
+
+
+def compute_plan(
+    local_labels: Mapping[str, Label],
+    remote_labels: Iterable[Label],
+    *,
+    detect_renames: bool = False,
+) -> Plan:
+    """Return the plan to sync the local labels with the remote labels.
+
+    Local labels map section names of a labels file to labels. A local label
+    that matches no remote label by its section name updates the remote
+    label named in its previous_names, if any, instead of being created.
+    With detect_renames, labels that would otherwise be created are matched
+    with remote labels that would otherwise be deleted and have the same
+    color and non-empty description, if that match is unique.
+
+    Raise a PlanException for a section that neither matches a remote label
+    nor the name parameter of its label.
+    """
+    plan = Plan()
+    remaining = {label.name: label for label in remote_labels}
+
+    for remote_name, local_label in local_labels.items():
+        if remote_name not in remaining:
+            remote_name = next(
+                (name for name in local_label.previous_names if name in remaining),
+                remote_name,
+            )
+
+        remote_label = remaining.pop(remote_name, None)
+
+        if remote_label is None:
+            if remote_name != local_label.name:
+                raise PlanException(
+                    f'There is no remote label "{remote_name}" and '
+                    f"this name does not match the name "
+                    f'parameter: "{local_label.name}"'
+                )
+            plan.create[remote_name] = local_label
+        elif local_label.params_equal(remote_label):
+            plan.ignore[remote_name] = local_label
+        else:
+            plan.update[remote_name] = local_label
+
+    if detect_renames:
+        for local_name, remote_name in match_renames(plan.create, remaining):
+            plan.update[remote_name] = plan.create.pop(local_name)
+            del remaining[remote_name]
+
+    plan.delete.update(remaining)
+
+    return plan
+
+
+def match_renames(
+    created: Mapping[str, Label], deleted: Mapping[str, Label]
+) -> List[Tuple[str, str]]:
+    """Return pairs of names of created and deleted labels that are likely
+    the same label under a new name.
+
+    Labels match if they have the same color and description and no other
+    created or deleted label has the same color and description.
+    """
+
+    def similarity_key(label: Label) -> Tuple[str, str]:
+        return label.color.lower(), label.description.strip()
+
+    created_by_key: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+    deleted_by_key: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+
+    for name, label in created.items():
+        if label.description.strip():
+            created_by_key[similarity_key(label)].append(name)
+
+    for name, label in deleted.items():
+        if label.description.strip():
+            deleted_by_key[similarity_key(label)].append(name)
+
+    return [
+        (created_names[0], deleted_by_key[key][0])
+        for key, created_names in created_by_key.items()
+        if len(created_names) == 1 and len(deleted_by_key.get(key, [])) == 1
+    ]
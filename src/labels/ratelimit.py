@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+
+# GitHub asks clients to wait at least one minute after hitting a secondary
+# rate limit if the response has no Retry-After header.
+SECONDARY_RATE_LIMIT_WAIT = 60.0
+
+
+class RateLimiter:
+    """Pace requests according to the GitHub API rate limit.
+
+    The limiter tracks the remaining requests and the time when the rate
+    limit resets from the response headers. Once fewer than reserve requests
+    remain, requests are spread out evenly until the reset. A single limiter
+    is safe to share between threads and between clients using the same
+    credentials.
+
+    GitHub API docs:
+    https://docs.github.com/en/rest/overview/resources-in-the-rest-api#rate-limiting
+    """
+
+    remaining: Optional[int]
+    reset: Optional[float]
+    reserve: int
+    retries: int
+
+    def __init__(
+        self,
+        *,
+        reserve: int = 100,
+        retries: int = 3,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.remaining = None
+        self.reset = None
+        self.reserve = reserve
+        self.retries = retries
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._blocked_until = 0.0
+
+    def wait(self) -> None:
+        """Block until the next request may be sent."""
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot, self._blocked_until)
+            interval = 0.0
+
+            if self.remaining is not None and self.reset is not None:
+                if self.reset > now and self.remaining <= 0:
+                    slot = max(slot, self.reset)
+                elif self.reset > now and self.remaining < self.reserve:
+                    interval = (self.reset - now) / self.remaining
+
+                self.remaining -= 1
+
+            self._next_slot = slot + interval
+
+        if slot > now:
+            logger = logging.getLogger("labels")
+            logger.debug(f"Waiting {slot - now:.1f}s for the rate limit")
+            self._sleep(slot - now)
+
+    def update(self, response: requests.Response) -> None:
+        """Update the rate limit information from the response headers."""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+
+        with self._lock:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset is not None:
+                self.reset = float(reset)
+
+    def backoff(self, response: requests.Response) -> bool:
+        """Return whether the request was rate limited and should be retried.
+
+        Subsequent calls to wait() block until GitHub accepts requests again.
+        """
+        if response.status_code not in (403, 429):
+            return False
+
+        now = self._clock()
+        retry_after = response.headers.get("Retry-After")
+
+        if retry_after is not None:
+            blocked_until = now + float(retry_after)
+        elif response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = response.headers.get("X-RateLimit-Reset")
+            blocked_until = now if reset is None else float(reset)
+        elif "secondary rate limit" in response.text.lower():
+            blocked_until = now + SECONDARY_RATE_LIMIT_WAIT
+        else:
+            return False
+
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, blocked_until)
+
+        return True
@@ -0,0 +1,43 @@
+import logging
+from typing import List, Optional, Tuple
+
+import attr
+
+from labels.github import Client, Label, Page, Repository
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class RemoteState:
+    """Remote labels of a repository as of the last sync, along with the
+    Pages that they were read from.
+    """
+
+    labels: List[Label] = attr.ib(factory=list)
+    pages: List[Page] = attr.ib(factory=list)
+
+
+def list_labels_incremental(
+    client: Client,
+    repository: Repository,
+    state: Optional[RemoteState],
+    *,
+    jobs: int = 1,
+) -> Tuple[List[Label], List[Page]]:
+    """Return the remote labels of the repository and the Pages that they
+    were read from.
+
+    If none of the pages of the given state changed since the last sync, the
+    labels of the state are returned without listing the remote labels. This
+    only sends conditional requests, which GitHub does not count against the
+    rate limit if the labels are unchanged.
+    """
+    logger = logging.getLogger("labels")
+
+    if state is not None and state.pages and not client.pages_changed(state.pages):
+        logger.debug(
+            f"Labels for {repository.owner}/{repository.name} "
+            f"did not change since the last sync"
+        )
+        return state.labels, state.pages
+
+    return client.list_labels_with_pages(repository, jobs=jobs)
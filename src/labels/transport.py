@@ -0,0 +1,91 @@
+import random
+from typing import Any, Collection, Optional
+
+import requests
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Status codes for server errors that are usually resolved by trying again.
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+# Idempotent methods, including PATCH for editing labels, which sets the same
+# label parameters when sent more than once. POST for creating labels is not
+# retried, as it may create a label that then fails with a 422 on retry.
+RETRY_METHODS = Retry.DEFAULT_ALLOWED_METHODS | {"PATCH"}
+
+
+class RetryPolicy(Retry):
+    """Retry configuration for the transport adapter of a Client.
+
+    This adds a random jitter of up to the given number of seconds to the
+    exponential backoff between attempts, so that concurrent requests that
+    failed at the same time are not retried at the same time. Which requests
+    are retried depends on the allowed methods, which are RETRY_METHODS when
+    created by create_retry_policy().
+    """
+
+    jitter: float
+
+    def __init__(self, *args: Any, jitter: float = 0.0, **kwargs: Any) -> None:
+        self.jitter = jitter
+        super().__init__(*args, **kwargs)
+
+    def new(self, **kwargs: Any) -> "RetryPolicy":
+        kwargs.setdefault("jitter", self.jitter)
+        retry: RetryPolicy = super().new(**kwargs)
+        return retry
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return backoff
+        return float(backoff + random.uniform(0, self.jitter))
+
+
+def create_retry_policy(
+    *,
+    total: int = 3,
+    backoff_factor: float = 0.5,
+    jitter: float = 0.5,
+    status_forcelist: Collection[int] = RETRY_STATUS_CODES,
+    allowed_methods: Collection[str] = RETRY_METHODS,
+) -> RetryPolicy:
+    """Return a retry policy for transient errors of requests with the
+    allowed methods.
+    """
+    return RetryPolicy(
+        total=total,
+        backoff_factor=backoff_factor,
+        jitter=jitter,
+        status_forcelist=status_forcelist,
+        allowed_methods=allowed_methods,
+        raise_on_status=False,
+    )
+
+
+def create_session(
+    *,
+    pool_connections: int = DEFAULT_POOLSIZE,
+    pool_maxsize: int = DEFAULT_POOLSIZE,
+    pool_block: bool = DEFAULT_POOLBLOCK,
+    retries: Optional[RetryPolicy] = None,
+) -> requests.Session:
+    """Return a session with a transport adapter for the GitHub API.
+
+    The session keeps up to pool_maxsize connections per host alive for reuse
+    across requests. Set this to at least the number of concurrent requests,
+    or set pool_block to wait for a free connection instead of opening a new
+    one that is discarded afterwards. The session may be shared between
+    clients, as credentials are sent with every request.
+    """
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=create_retry_policy() if retries is None else retries,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
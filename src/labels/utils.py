@@ -38,3 +38,32 @@ def load_repository_info(remote_name: str = "origin") -> typing.Optional[Reposit
         return None
 
     return Repository(owner=match.group("owner"), name=match.group("name"))
+
+
+def read_repositories(filename: str) -> typing.List[Repository]:
+    """Load repositories from a file with one owner/name per line.
+
+    Blank lines and lines starting with '#' are ignored.
+    """
+    logger = logging.getLogger("labels")
+    logger.debug(f"Reading repositories from {filename}")
+
+    repositories = []
+
+    with open(filename, "r", encoding="utf-8") as repositories_file:
+        for line_number, line in enumerate(repositories_file, 1):
+            line = line.strip()
+
+            if not line or line.startswith("#"):
+                continue
+
+            owner, _, name = line.partition("/")
+
+            if not owner or not name or "/" in name:
+                raise ValueError(
+                    f"Invalid repository on line {line_number}: {line!r}"
+                )
+
+            repositories.append(Repository(owner=owner, name=name))
+
+    return repositories
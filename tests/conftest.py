@@ -1,3 +1,4 @@
+import re
 from typing import Any, Dict, Generator, List
 
 import attr
@@ -141,6 +142,24 @@ def fixture_response_get_infra(
     }
 
 
+@pytest.fixture(name="response_get_question")
+def fixture_response_get_question(
+    base_url: str, repo_owner: str, repo_name: str
+) -> ResponseLabel:
+    """Return a dict respresenting the GitHub API response body for the
+    question label, which has no description.
+    """
+    return {
+        "id": 4321,
+        "node_id": "8765",
+        "url": f"{base_url}/repos/{repo_owner}/{repo_name}/labels/question",
+        "name": "question",
+        "description": None,
+        "color": "cc317c",
+        "default": False,
+    }
+
+
 @pytest.fixture(name="response_list_labels")
 def fixture_response_list_labels(
     response_get_infra: ResponseLabel,
@@ -209,6 +228,59 @@ def fixture_mock_list_labels_paginated(
             },
         )
 
+        yield rsps
+
+
+@pytest.fixture(name="mock_list_labels_last_page")
+def fixture_mock_list_labels_last_page(
+    base_url: str,
+    repo_owner: str,
+    repo_name: str,
+    repo_id: int,
+    response_get_infra: ResponseLabel,
+    response_get_docs: ResponseLabel,
+    response_get_bug: ResponseLabel,
+) -> Generator:
+    """Mock requests for list labels with three pages and a last link."""
+
+    with responses.RequestsMock() as rsps:
+
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repos/{repo_owner}/{repo_name}/labels",
+            json=[response_get_bug],
+            status=200,
+            content_type="application/json",
+            headers={
+                "Link": (
+                    f'<{base_url}/repositories/{repo_id}/labels?page=2>; rel="next", '
+                    f'<{base_url}/repositories/{repo_id}/labels?page=3>; rel="last"'
+                )
+            },
+        )
+
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repositories/{repo_id}/labels?page=2",
+            json=[response_get_docs],
+            status=200,
+            content_type="application/json",
+            headers={
+                "Link": (
+                    f'<{base_url}/repositories/{repo_id}/labels?page=3>; rel="next", '
+                    f'<{base_url}/repositories/{repo_id}/labels?page=3>; rel="last"'
+                )
+            },
+        )
+
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repositories/{repo_id}/labels?page=3",
+            json=[response_get_infra],
+            status=200,
+            content_type="application/json",
+        )
+
         yield
 
 
@@ -341,6 +413,219 @@ def fixture_mock_sync(
             status=204,
         )
 
+        yield rsps
+
+
+@pytest.fixture(name="mock_sync_null_description")
+def fixture_mock_sync_null_description(
+    mock_sync: responses.RequestsMock,
+    base_url: str,
+    repo_owner: str,
+    repo_name: str,
+    response_list_labels: ResponseLabels,
+) -> responses.RequestsMock:
+    """Mock requests for sync, where GitHub returns a null description for the
+    "infra" label.
+    """
+    mock_sync.replace(
+        responses.GET,
+        f"{base_url}/repos/{repo_owner}/{repo_name}/labels",
+        json=[
+            {**label, "description": None} if label["name"] == "infra" else label
+            for label in response_list_labels
+        ],
+        status=200,
+        content_type="application/json",
+    )
+    return mock_sync
+
+
+@pytest.fixture(name="mock_plan")
+def fixture_mock_plan(
+    base_url: str, repo_owner: str, repo_name: str, response_list_labels: ResponseLabels
+) -> Generator:
+    """Mock requests for listing labels with an ETag."""
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repos/{repo_owner}/{repo_name}/labels",
+            json=response_list_labels,
+            status=200,
+            content_type="application/json",
+            headers={"ETag": '"abc"'},
+        )
+        yield rsps
+
+
+@pytest.fixture(name="mock_plan_null_description")
+def fixture_mock_plan_null_description(
+    mock_plan: responses.RequestsMock,
+    base_url: str,
+    repo_owner: str,
+    repo_name: str,
+    response_list_labels: ResponseLabels,
+) -> responses.RequestsMock:
+    """Mock requests for listing labels with an ETag, where GitHub returns a
+    null description for the "infra" label.
+    """
+    mock_plan.replace(
+        responses.GET,
+        f"{base_url}/repos/{repo_owner}/{repo_name}/labels",
+        json=[
+            {**label, "description": None} if label["name"] == "infra" else label
+            for label in response_list_labels
+        ],
+        status=200,
+        content_type="application/json",
+        headers={"ETag": '"abc"'},
+    )
+    return mock_plan
+
+
+@pytest.fixture(name="mock_apply")
+def fixture_mock_apply(base_url: str, repo_owner: str, repo_name: str) -> Generator:
+    """Mock requests for checking that labels did not change and for deleting
+    the "infra" label.
+    """
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repos/{repo_owner}/{repo_name}/labels",
+            status=304,
+            headers={"ETag": '"abc"'},
+        )
+        rsps.add(
+            responses.DELETE,
+            f"{base_url}/repos/{repo_owner}/{repo_name}/labels/infra",
+            status=204,
+        )
+        yield
+
+
+@pytest.fixture(name="mock_sync_unchanged")
+def fixture_mock_sync_unchanged(
+    base_url: str, repo_owner: str, repo_name: str
+) -> Generator:
+    """Mock requests for checking that labels did not change since the last
+    sync.
+    """
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repos/{repo_owner}/{repo_name}/labels",
+            status=304,
+            headers={"ETag": '"abc"'},
+        )
+        yield
+
+
+@pytest.fixture(name="mock_apply_changed")
+def fixture_mock_apply_changed(
+    base_url: str, repo_owner: str, repo_name: str, response_list_labels: ResponseLabels
+) -> Generator:
+    """Mock requests for checking labels that changed."""
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repos/{repo_owner}/{repo_name}/labels",
+            json=response_list_labels,
+            status=200,
+            content_type="application/json",
+            headers={"ETag": '"xyz"'},
+        )
+        yield
+
+
+@pytest.fixture(name="mock_list_labels_many")
+def fixture_mock_list_labels_many(
+    base_url: str, repo_owner: str, response_list_labels: ResponseLabels
+) -> Generator:
+    """Mock requests for listing the labels of any repository of the owner."""
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            re.compile(f"{re.escape(base_url)}/repos/{repo_owner}/[^/]+/labels"),
+            json=response_list_labels,
+            status=200,
+            content_type="application/json",
+        )
+        yield
+
+
+@pytest.fixture(name="mock_sync_many")
+def fixture_mock_sync_many(
+    base_url: str, repo_owner: str, response_list_labels: ResponseLabels
+) -> Generator:
+    """Mock requests for syncing the labels of an organization, where the
+    labels of one repository cannot be retrieved.
+    """
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            f"{base_url}/orgs/{repo_owner}/repos",
+            json=[
+                {"name": "turtle", "owner": {"login": repo_owner}},
+                {"name": "earth", "owner": {"login": repo_owner}},
+                {"name": "moon", "owner": {"login": repo_owner}, "archived": True},
+            ],
+            status=200,
+            content_type="application/json",
+        )
+
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repos/{repo_owner}/turtle/labels",
+            json=response_list_labels,
+            status=200,
+            content_type="application/json",
+        )
+
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repos/{repo_owner}/earth/labels",
+            status=404,
+        )
+
+        yield
+
+
+@pytest.fixture(name="mock_fetch_many_graphql")
+def fixture_mock_fetch_many_graphql(
+    base_url: str, response_list_labels: ResponseLabels
+) -> Generator:
+    """Mock a GraphQL query for the labels of two repositories, where the
+    second repository does not exist.
+    """
+    body = {
+        "data": {
+            "repo0": {
+                "labels": {
+                    "nodes": [
+                        {
+                            "id": label["node_id"],
+                            "name": label["name"],
+                            "color": label["color"],
+                            "description": label["description"],
+                            "isDefault": label["default"],
+                        }
+                        for label in response_list_labels
+                    ],
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                }
+            },
+            "repo1": None,
+        },
+        "errors": [
+            {
+                "type": "NOT_FOUND",
+                "path": ["repo1"],
+                "message": "Could not resolve to a Repository",
+            }
+        ],
+    }
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.POST, f"{base_url}/graphql", json=body, status=200)
         yield
 
 
@@ -438,6 +723,13 @@ def fixture_labels_file_content() -> Dict[str, Any]:
     }
 
 
+@pytest.fixture(name="binary_file_write")
+def fixture_binary_file_write(tmpdir: Any) -> str:
+    """Return a filepath to a temporary file in the binary format."""
+    binary_file = tmpdir.join("labels.bin")
+    return str(binary_file)
+
+
 @pytest.fixture(name="labels_file_write")
 def fixture_labels_file_write(tmpdir: Any) -> str:
     """Return a filepath to a temporary file."""
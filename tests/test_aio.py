@@ -0,0 +1,208 @@
+import asyncio
+import json
+import typing
+
+import pytest
+
+from labels.exceptions import GitHubException
+from labels.github import Label, Repository
+
+httpx = pytest.importorskip("httpx")
+
+from labels.aio import AsyncClient, sync_labels  # noqa: E402
+
+Handler = typing.Callable[[typing.Any], typing.Any]
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(repo_owner: str, repo_name: str) -> Repository:
+    """Return a GitHub repository."""
+    return Repository(repo_owner, repo_name)
+
+
+@pytest.fixture(name="make_client")
+def fixture_make_client(
+    base_url: str, username: str, token: str
+) -> typing.Callable[[Handler], AsyncClient]:
+    """Return a function that creates an AsyncClient for a mock handler."""
+
+    def make_client(handler: Handler) -> AsyncClient:
+        session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return AsyncClient((username, token), base_url=base_url, session=session)
+
+    return make_client
+
+
+def test_list_labels_pagination(
+    make_client: typing.Callable[[Handler], AsyncClient],
+    repo: Repository,
+    base_url: str,
+    repo_id: int,
+    response_get_bug: typing.Dict,
+    response_get_docs: typing.Dict,
+    response_get_infra: typing.Dict,
+) -> None:
+    """Test that list_labels() follows the next links of the responses."""
+
+    def handler(request: typing.Any) -> typing.Any:
+        if request.url.params.get("page") == "2":
+            return httpx.Response(200, json=[response_get_infra])
+
+        link = f'<{base_url}/repositories/{repo_id}/labels?page=2>; rel="next"'
+        return httpx.Response(
+            200, json=[response_get_bug, response_get_docs], headers={"Link": link}
+        )
+
+    async def list_labels() -> typing.List[Label]:
+        async with make_client(handler) as client:
+            return await client.list_labels(repo)
+
+    labels = asyncio.run(list_labels())
+
+    assert [label.name for label in labels] == ["bug", "docs", "infra"]
+
+
+def test_sync_labels(
+    make_client: typing.Callable[[Handler], AsyncClient],
+    repo: Repository,
+    response_list_labels: typing.List[typing.Dict],
+) -> None:
+    """Test that sync_labels() deletes, edits and creates remote labels."""
+    requests = []
+
+    def handler(request: typing.Any) -> typing.Any:
+        requests.append((request.method, request.url.path))
+
+        if request.method == "GET":
+            return httpx.Response(200, json=response_list_labels)
+        if request.method == "DELETE":
+            return httpx.Response(204)
+
+        label = json.loads(request.content)
+        status = 201 if request.method == "POST" else 200
+        return httpx.Response(status, json=label)
+
+    local_labels = {
+        "bug": Label(color="fcc4db", name="bug"),
+        "docs": Label(
+            color="2abf88",
+            name="docs",
+            description="Tasks to write and update documentation",
+        ),
+        "dependencies": Label(color="43a2b7", name="dependencies"),
+    }
+
+    async def sync() -> typing.Dict:
+        async with make_client(handler) as client:
+            return await sync_labels(client, repo, local_labels)
+
+    failures = asyncio.run(sync())
+
+    path = f"/repos/{repo.owner}/{repo.name}/labels"
+    assert failures == {}
+    assert requests == [
+        ("GET", path),
+        ("DELETE", f"{path}/infra"),
+        ("PATCH", f"{path}/bug"),
+        ("POST", path),
+    ]
+
+
+def test_client_keeps_session_auth(
+    repo: Repository,
+    username: str,
+    token: str,
+    response_get_bug: typing.Dict,
+) -> None:
+    """Test that AsyncClient sends its auth per request and does not change
+    the auth of the session that it was given.
+    """
+    headers = []
+
+    def handler(request: typing.Any) -> typing.Any:
+        headers.append(request.headers.get("Authorization"))
+        return httpx.Response(200, json=response_get_bug)
+
+    session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client = AsyncClient((username, token), session=session)
+
+    async def get_label() -> Label:
+        async with client:
+            return await client.get_label(repo, name="bug")
+
+    label = asyncio.run(get_label())
+
+    assert label.name == "bug"
+    assert session.auth is None
+    assert headers[0].startswith("Basic ")
+
+
+def test_client_keeps_session_open(
+    repo: Repository,
+    username: str,
+    token: str,
+    response_get_bug: typing.Dict,
+) -> None:
+    """Test that AsyncClient only closes the session if it created it, as a
+    session that was passed in may be shared with other clients.
+    """
+
+    def handler(request: typing.Any) -> typing.Any:
+        return httpx.Response(200, json=response_get_bug)
+
+    session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def get_labels() -> typing.List[Label]:
+        labels = []
+        async with session:
+            for _ in range(2):
+                async with AsyncClient((username, token), session=session) as client:
+                    labels.append(await client.get_label(repo, name="bug"))
+                assert not session.is_closed
+        return labels
+
+    async def close_own_session() -> bool:
+        async with AsyncClient((username, token)) as client:
+            pass
+        return bool(client.session.is_closed)
+
+    assert [label.name for label in asyncio.run(get_labels())] == ["bug", "bug"]
+    assert session.is_closed
+    assert asyncio.run(close_own_session())
+
+
+def test_sync_labels_transport_error(
+    make_client: typing.Callable[[Handler], AsyncClient],
+    repo: Repository,
+    response_list_labels: typing.List[typing.Dict],
+) -> None:
+    """Test that sync_labels() reports transport errors as failures rather
+    than aborting the remaining requests.
+    """
+
+    def handler(request: typing.Any) -> typing.Any:
+        if request.method == "GET":
+            return httpx.Response(200, json=response_list_labels)
+        if request.method == "DELETE":
+            raise httpx.ReadTimeout("timed out", request=request)
+
+        return httpx.Response(200, json=json.loads(request.content))
+
+    local_labels = {
+        "bug": Label(color="fcc4db", name="bug"),
+        "docs": Label(
+            color="2abf88",
+            name="docs",
+            description="Tasks to write and update documentation",
+        ),
+    }
+
+    async def sync() -> typing.Dict:
+        async with make_client(handler) as client:
+            return await sync_labels(client, repo, local_labels)
+
+    failures = asyncio.run(sync())
+
+    assert list(failures) == ["infra"]
+    assert isinstance(failures["infra"], GitHubException)
+    assert "Error sending request" in str(failures["infra"])
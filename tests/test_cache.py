@@ -0,0 +1,113 @@
+import typing
+
+import pytest
+import requests
+import responses
+from requests.auth import HTTPBasicAuth
+
+from labels.cache import HTTPCache
+from labels.github import Client, Repository
+
+
+@pytest.fixture(name="cache")
+def fixture_cache(tmpdir: typing.Any) -> HTTPCache:
+    """Return a cache in a temporary directory."""
+    return HTTPCache(str(tmpdir.join("cache")))
+
+
+@pytest.fixture(name="client")
+def fixture_client(
+    base_url: str, username: str, token: str, cache: HTTPCache
+) -> Client:
+    """Return a GitHub API client with a cache."""
+    return Client(HTTPBasicAuth(username, token), base_url=base_url, cache=cache)
+
+
+def test_list_labels_not_modified(
+    client: Client,
+    base_url: str,
+    repo_owner: str,
+    repo_name: str,
+    response_list_labels: typing.List[typing.Dict],
+) -> None:
+    """Test that list_labels() uses the cached labels for a 304 response."""
+    repo = Repository(repo_owner, repo_name)
+    url = f"{base_url}/repos/{repo_owner}/{repo_name}/labels"
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            url,
+            json=response_list_labels,
+            status=200,
+            headers={"ETag": '"abc"'},
+        )
+        rsps.add(responses.GET, url, status=304)
+
+        first = client.list_labels(repo)
+        second = client.list_labels(repo)
+
+        assert "If-None-Match" not in rsps.calls[0].request.headers
+        assert rsps.calls[1].request.headers["If-None-Match"] == '"abc"'
+
+    assert first == second
+    assert [label.name for label in second] == ["infra", "docs", "bug"]
+
+
+def test_list_labels_not_modified_new_page(
+    client: Client,
+    cache: HTTPCache,
+    base_url: str,
+    repo_owner: str,
+    repo_name: str,
+    response_list_labels: typing.List[typing.Dict],
+    response_get_question: typing.Dict,
+) -> None:
+    """Test that list_labels() follows the Link header of a 304 response
+    rather than the one of the cached response.
+    """
+    repo = Repository(repo_owner, repo_name)
+    url = f"{base_url}/repos/{repo_owner}/{repo_name}/labels"
+    next_url = f"{url}?page=2"
+    link = f'<{next_url}>; rel="next"'
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            url,
+            json=response_list_labels,
+            status=200,
+            headers={"ETag": '"abc"'},
+        )
+        rsps.add(
+            responses.GET, url, status=304, headers={"ETag": '"abc"', "Link": link}
+        )
+        rsps.add(
+            responses.GET,
+            next_url,
+            json=[response_get_question],
+            status=200,
+            headers={"ETag": '"def"'},
+        )
+
+        client.list_labels(repo)
+        labels = client.list_labels(repo)
+
+    assert [label.name for label in labels] == ["infra", "docs", "bug", "question"]
+
+    cached = cache.get(f"{url}?per_page=100")
+    assert cached is not None
+    assert cached.headers["Link"] == link
+
+
+def test_set_without_validators(cache: HTTPCache, base_url: str) -> None:
+    """Test that responses without ETag or Last-Modified are not cached."""
+    url = f"{base_url}/repos/hackebrot/turtle/labels"
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, url, json=[], status=200)
+        response = requests.get(url)
+
+    cache.set(url, response)
+
+    assert cache.get(url) is None
@@ -1,11 +1,24 @@
 import typing
 import shlex
+import subprocess
+import sys
 
 import pytest
 from click.testing import CliRunner
 
 from labels import __version__
 from labels.cli import labels
+from labels.github import Client, Label, Page, Repository
+from labels.io import (
+    read_labels,
+    read_plan,
+    read_snapshot,
+    read_state,
+    write_plan,
+    write_state,
+)
+from labels.plan import Plan
+from labels.state import RemoteState
 
 
 @pytest.fixture(name="set_username", autouse=True)
@@ -40,6 +53,34 @@ def test_version_option(run_cli: typing.Callable, version_option: str) -> None:
     assert result.output == f"labels, version {__version__}\n"
 
 
+def test_startup_imports() -> None:
+    """Test that importing the CLI and printing the version does not import
+    requests, attrs or the TOML packages, using the import time log.
+    """
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from labels.cli import labels; labels(['--version'])",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        encoding="utf-8",
+    )
+    assert proc.returncode == 0
+    assert proc.stdout == f"labels, version {__version__}\n"
+
+    imported = {
+        line.split("|")[-1].strip()
+        for line in proc.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+    heavy = {"requests", "attr", "tomli", "tomli_w", "labels.github", "labels.io"}
+    assert imported & heavy == set()
+
+
 @pytest.mark.usefixtures("mock_list_labels", "mock_repo_info")
 @pytest.mark.parametrize(
     "repo_owner, repo_name, remote_url",
@@ -178,6 +219,7 @@ def test_sync(
     assert (
         f"Creating label 'dependencies' for {repo_owner}/{repo_name}" in result.output
     )
+    assert f"Writing labels to {labels_file_sync}" not in result.output
 
 
 @pytest.mark.usefixtures("mock_list_labels", "mock_repo_info")
@@ -204,3 +246,298 @@ def test_sync_dryrun(
         "  - docs\n"
     )
     assert output in result.output
+
+
+@pytest.mark.usefixtures("mock_sync", "mock_repo_info")
+@pytest.mark.parametrize(
+    "repo_owner, repo_name, remote_url",
+    [("pytest-dev", "pytest", "git@github.com:hackebrot/pytest-emoji.git")],
+    ids=["override_owner_and_repo"],
+)
+def test_sync_jobs(
+    run_cli: typing.Callable, repo_owner: str, repo_name: str, labels_file_sync: str
+) -> None:
+    """Test that sync with the jobs option modifies all labels."""
+    result = run_cli(
+        f"-v sync -j 4 -o {repo_owner} -r {repo_name} -f {labels_file_sync}"
+    )
+    assert result.exit_code == 0
+    assert f"Deleting label 'infra' for {repo_owner}/{repo_name}" in result.output
+    assert f"Editing label 'bug' for {repo_owner}/{repo_name}" in result.output
+    assert (
+        f"Creating label 'dependencies' for {repo_owner}/{repo_name}" in result.output
+    )
+
+    deleting = result.output.index("Deleting label")
+    editing = result.output.index("Editing label")
+    creating = result.output.index("Creating label")
+    assert deleting < editing < creating
+
+
+@pytest.mark.usefixtures("mock_sync", "mock_repo_info")
+@pytest.mark.parametrize(
+    "repo_owner, repo_name, remote_url",
+    [("pytest-dev", "pytest", "git@github.com:hackebrot/pytest-emoji.git")],
+    ids=["override_owner_and_repo"],
+)
+def test_sync_many(
+    run_cli: typing.Callable,
+    repo_owner: str,
+    repo_name: str,
+    labels_file_sync: str,
+    tmpdir: typing.Any,
+) -> None:
+    """Test that sync-many syncs the repositories from a file."""
+    repos_file = tmpdir.join("repos.txt")
+    repos_file.write(f"{repo_owner}/{repo_name}\n")
+
+    result = run_cli(f"sync-many --repos-file {repos_file} -f {labels_file_sync}")
+    assert result.exit_code == 0
+    assert result.output == (
+        f"{repo_owner}/{repo_name}: "
+        "1 to delete, 1 to update, 1 to create, 1 unchanged\n"
+    )
+
+
+@pytest.mark.usefixtures("mock_list_labels_many")
+@pytest.mark.parametrize("command", ["sync-many -n", "fetch-many"])
+def test_many_shared_client(
+    run_cli: typing.Callable,
+    mocker: typing.Any,
+    repo_owner: str,
+    labels_file_sync: str,
+    tmpdir: typing.Any,
+    command: str,
+) -> None:
+    """Test that commands for many repositories share a single client between
+    their worker threads.
+    """
+    client_class = mocker.patch("labels.github.Client", wraps=Client)
+    repos_file = tmpdir.join("repos.txt")
+    repos_file.write("".join(f"{repo_owner}/repo{i}\n" for i in range(4)))
+    snapshot_file = tmpdir.join("snapshot.toml")
+
+    result = run_cli(
+        f"{command} --repos-file {repos_file} -j 4 "
+        f"-f {snapshot_file if command == 'fetch-many' else labels_file_sync}"
+    )
+    assert result.exit_code == 0
+    assert client_class.call_count == 1
+
+
+@pytest.mark.usefixtures("mock_sync_many")
+def test_sync_many_org_dryrun(
+    run_cli: typing.Callable, repo_owner: str, labels_file_sync: str
+) -> None:
+    """Test that sync-many reports repositories that could not be synced."""
+    result = run_cli(f"sync-many -n --org {repo_owner} -f {labels_file_sync}")
+    assert result.exit_code == 1
+    assert result.output == (
+        f"{repo_owner}/earth: failed - Error retrieving labels: 404 - Not Found\n"
+        f"{repo_owner}/turtle: 1 to delete, 1 to update, 1 to create, 1 unchanged\n"
+    )
+
+
+def test_sync_many_requires_repositories(
+    run_cli: typing.Callable, labels_file_sync: str
+) -> None:
+    """Test that sync-many requires either a repositories file or an org."""
+    result = run_cli(f"sync-many -f {labels_file_sync}")
+    assert result.exit_code == 2
+    assert "Use exactly one of --repos-file and --org." in result.output
+
+
+@pytest.mark.usefixtures("mock_sync_many")
+def test_fetch_many_org(
+    run_cli: typing.Callable, repo_owner: str, labels_file_write: str
+) -> None:
+    """Test that fetch-many writes the labels of all repositories that could
+    be fetched to the snapshot file.
+    """
+    result = run_cli(f"fetch-many --org {repo_owner} -j 2 -f {labels_file_write}")
+    assert result.exit_code == 1
+    assert result.output == (
+        f"{repo_owner}/earth: Error retrieving labels: 404 - Not Found\n"
+    )
+
+    snapshot = read_snapshot(labels_file_write)
+    assert list(snapshot) == [f"{repo_owner}/turtle"]
+    assert sorted(snapshot[f"{repo_owner}/turtle"]) == ["bug", "docs", "infra"]
+
+
+@pytest.mark.usefixtures("mock_fetch_many_graphql")
+def test_fetch_many_graphql_not_found(
+    run_cli: typing.Callable,
+    repo_owner: str,
+    labels_file_write: str,
+    tmpdir: typing.Any,
+) -> None:
+    """Test that fetch-many with the graphql option only reports repositories
+    that could not be fetched and writes the labels of the others.
+    """
+    repos_file = tmpdir.join("repos.txt")
+    repos_file.write(f"{repo_owner}/turtle\n{repo_owner}/earth\n")
+
+    result = run_cli(
+        f"fetch-many --graphql --repos-file {repos_file} -f {labels_file_write}"
+    )
+    assert result.exit_code == 1
+    assert result.output == (
+        f"{repo_owner}/earth: Error retrieving labels for {repo_owner}/earth: "
+        f"Could not resolve to a Repository\n"
+    )
+
+    snapshot = read_snapshot(labels_file_write)
+    assert list(snapshot) == [f"{repo_owner}/turtle"]
+    assert sorted(snapshot[f"{repo_owner}/turtle"]) == ["bug", "docs", "infra"]
+
+
+@pytest.fixture(name="plan_file")
+def fixture_plan_file(
+    tmpdir: typing.Any, base_url: str, repo_owner: str, repo_name: str
+) -> str:
+    """Return the path to a plan for deleting the "infra" label."""
+    plan_file = str(tmpdir.join("labels-plan.toml"))
+    page = Page(
+        url=f"{base_url}/repos/{repo_owner}/{repo_name}/labels?per_page=100",
+        etag='"abc"',
+    )
+    plan = Plan(delete={"infra": Label(color="f9d03b", name="infra")})
+
+    write_plan(plan_file, Repository(repo_owner, repo_name), plan, [page])
+    return plan_file
+
+
+@pytest.mark.usefixtures("mock_plan")
+def test_plan(
+    run_cli: typing.Callable,
+    repo_owner: str,
+    repo_name: str,
+    labels_file_sync: str,
+    tmpdir: typing.Any,
+) -> None:
+    """Test that plan writes the planned changes and the remote state."""
+    plan_file = str(tmpdir.join("labels-plan.toml"))
+
+    result = run_cli(
+        f"plan -o {repo_owner} -r {repo_name} -f {labels_file_sync} -p {plan_file}"
+    )
+    assert result.exit_code == 0
+    assert "This would delete the following labels:\n  - infra\n" in result.output
+
+    repository, plan, pages = read_plan(plan_file)
+    assert repository == Repository(repo_owner, repo_name)
+    assert list(plan.delete) == ["infra"]
+    assert list(plan.update) == ["bug"]
+    assert list(plan.create) == ["dependencies"]
+    assert list(plan.ignore) == ["docs"]
+    assert [page.etag for page in pages] == ['"abc"']
+
+
+@pytest.mark.usefixtures("mock_plan_null_description")
+def test_plan_null_description(
+    run_cli: typing.Callable,
+    repo_owner: str,
+    repo_name: str,
+    labels_file_sync: str,
+    tmpdir: typing.Any,
+) -> None:
+    """Test that plan writes a plan that deletes a label without a
+    description.
+    """
+    plan_file = str(tmpdir.join("labels-plan.toml"))
+
+    result = run_cli(
+        f"plan -o {repo_owner} -r {repo_name} -f {labels_file_sync} -p {plan_file}"
+    )
+    assert result.exit_code == 0, result.output
+
+    _, plan, _ = read_plan(plan_file)
+    assert plan.delete["infra"].description == ""
+
+
+@pytest.mark.usefixtures("mock_apply")
+def test_apply(
+    run_cli: typing.Callable,
+    repo_owner: str,
+    repo_name: str,
+    plan_file: str,
+    labels_file_sync: str,
+) -> None:
+    """Test that apply modifies labels without listing them again."""
+    result = run_cli(f"-v apply -p {plan_file} -f {labels_file_sync}")
+    assert result.exit_code == 0
+    assert f"Deleting label 'infra' for {repo_owner}/{repo_name}" in result.output
+
+
+@pytest.mark.usefixtures("mock_sync_unchanged")
+def test_sync_state_file(
+    run_cli: typing.Callable,
+    base_url: str,
+    repo_owner: str,
+    repo_name: str,
+    labels_file_sync: str,
+    tmpdir: typing.Any,
+) -> None:
+    """Test that sync does not list labels that did not change since the last
+    sync.
+    """
+    state_file = str(tmpdir.join("labels-state.toml"))
+    repository = Repository(repo_owner, repo_name)
+    page = Page(
+        url=f"{base_url}/repos/{repo_owner}/{repo_name}/labels?per_page=100",
+        etag='"abc"',
+    )
+    state = RemoteState(
+        labels=list(read_labels(labels_file_sync).values()), pages=[page]
+    )
+    write_state(state_file, {repository: state})
+
+    result = run_cli(
+        f"-v sync -o {repo_owner} -r {repo_name} -f {labels_file_sync} "
+        f"--state-file {state_file}"
+    )
+    assert result.exit_code == 0
+    assert "did not change since the last sync" in result.output
+    assert read_state(state_file) == {repository: state}
+
+
+@pytest.mark.usefixtures("mock_sync_null_description")
+def test_sync_state_file_null_description(
+    run_cli: typing.Callable,
+    repo_owner: str,
+    repo_name: str,
+    labels_file_sync: str,
+    tmpdir: typing.Any,
+) -> None:
+    """Test that sync writes the state file and updates the labels file when
+    a remote label has no description.
+    """
+    state_file = str(tmpdir.join("labels-state.toml"))
+
+    result = run_cli(
+        f"sync -o {repo_owner} -r {repo_name} -f {labels_file_sync} "
+        f"--state-file {state_file}"
+    )
+    assert result.exit_code == 0, result.output
+
+    state = read_state(state_file)[Repository(repo_owner, repo_name)]
+    assert state.labels[0] == Label(color="f9d03b", name="infra")
+    assert list(read_labels(labels_file_sync)) == ["bug", "dependencies", "docs"]
+
+
+@pytest.mark.usefixtures("mock_apply_changed")
+def test_apply_changed(
+    run_cli: typing.Callable,
+    repo_owner: str,
+    repo_name: str,
+    plan_file: str,
+    labels_file_sync: str,
+) -> None:
+    """Test that apply refuses to apply a plan if the labels changed."""
+    result = run_cli(f"apply -p {plan_file} -f {labels_file_sync}")
+    assert result.exit_code == 1
+    assert (
+        f"The labels of {repo_owner}/{repo_name} changed since the plan was created."
+        in result.output
+    )
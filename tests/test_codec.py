@@ -0,0 +1,31 @@
+import typing
+
+import pytest
+
+from labels.codec import STDLIB_CODEC, JSONCodec, default_codec, orjson_codec
+
+
+@pytest.fixture(name="codec", params=["json", "orjson"])
+def fixture_codec(request: typing.Any) -> JSONCodec:
+    """Return the codec for the json module or for orjson if installed."""
+    if request.param == "json":
+        return STDLIB_CODEC
+    pytest.importorskip("orjson")
+    return orjson_codec()
+
+
+def test_codec_roundtrip(codec: JSONCodec) -> None:
+    """Test that codecs encode to bytes and decode what they encoded."""
+    obj = {"name": "bug 🐛", "color": "ea707a", "description": None}
+
+    data = codec.dumps(obj)
+
+    assert isinstance(data, bytes)
+    assert codec.loads(data) == obj
+
+
+def test_default_codec(mocker: typing.Any) -> None:
+    """Test that the default codec falls back to the json module."""
+    mocker.patch.dict("sys.modules", {"orjson": None})
+
+    assert default_codec() is STDLIB_CODEC
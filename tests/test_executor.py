@@ -0,0 +1,57 @@
+import threading
+import typing
+
+import pytest
+
+from labels.exceptions import LabelsException
+from labels.executor import execute
+
+
+def square(number: int) -> int:
+    """Return the square of the given number or fail for negative numbers."""
+    if number < 0:
+        raise LabelsException(f"negative number: {number}")
+    return number * number
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_execute(jobs: int) -> None:
+    """Test that execute() returns a result or an error for every item."""
+    outcomes = execute(square, [1, -2, 3, 4, -5], jobs=jobs)
+
+    results = {}
+    errors = {}
+
+    for item, result, exc in outcomes:
+        if exc is None:
+            results[item] = result
+        else:
+            errors[item] = str(exc)
+
+    assert results == {1: 1, 3: 9, 4: 16}
+    assert errors == {-2: "negative number: -2", -5: "negative number: -5"}
+
+
+def test_execute_bounded() -> None:
+    """Test that execute() runs as many calls as jobs at once, but no more."""
+    lock = threading.Lock()
+    barrier = threading.Barrier(3)
+    running = 0
+    peak = 0
+
+    def track(item: int) -> int:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        # Hold each call until three of them overlap
+        barrier.wait(timeout=5)
+        with lock:
+            running -= 1
+        return item
+
+    items: typing.List[int] = list(range(9))
+    got = sorted(item for item, _, _ in execute(track, items, jobs=3))
+
+    assert got == items
+    assert peak == 3
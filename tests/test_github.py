@@ -1,8 +1,15 @@
+import json
+import typing
+
+import attr
 import pytest
+import responses
+from responses import matchers
 
 from requests.auth import HTTPBasicAuth
 
-from labels.github import Client, Label, Repository
+from labels.exceptions import GitHubException
+from labels.github import Client, Label, LabelPool, Page, Repository, page_urls
 
 
 @pytest.fixture(name="client")
@@ -71,6 +78,159 @@ def test_list_labels_pagination(client: Client, repo: Repository) -> None:
     assert [label.params_dict for label in labels] == expected_params
 
 
+def test_iter_labels(
+    client: Client,
+    repo: Repository,
+    mock_list_labels_paginated: responses.RequestsMock,
+) -> None:
+    """Test that iter_labels() yields the labels of a page before requesting
+    the next page.
+    """
+    labels = client.iter_labels(repo)
+
+    assert [next(labels).name, next(labels).name] == ["bug", "docs"]
+    assert len(mock_list_labels_paginated.calls) == 1
+
+    assert [label.name for label in labels] == ["infra"]
+    assert len(mock_list_labels_paginated.calls) == 2
+
+
+@pytest.mark.parametrize("per_page, want", [(None, "100"), (30, "30")])
+def test_list_labels_per_page(
+    base_url: str,
+    username: str,
+    token: str,
+    repo: Repository,
+    response_list_labels: typing.List[typing.Dict],
+    per_page: typing.Optional[int],
+    want: str,
+) -> None:
+    """Test that list_labels() requests pages with the configured page size."""
+    auth = HTTPBasicAuth(username, token)
+
+    if per_page is None:
+        client = Client(auth, base_url=base_url)
+    else:
+        client = Client(auth, base_url=base_url, per_page=per_page)
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repos/{repo.owner}/{repo.name}/labels",
+            json=response_list_labels,
+            status=200,
+            match=[matchers.query_param_matcher({"per_page": want})],
+        )
+
+        labels = client.list_labels(repo)
+
+    assert len(labels) == len(response_list_labels)
+
+
+@pytest.mark.parametrize(
+    "link, changed",
+    [
+        (None, False),
+        ('<{url}?page=1>; rel="first"', False),
+        ('<{url}?page=2>; rel="next", <{url}?page=2>; rel="last"', True),
+    ],
+    ids=["no_link", "same_link", "new_page"],
+)
+def test_pages_changed_new_page(
+    client: Client,
+    base_url: str,
+    repo: Repository,
+    link: typing.Optional[str],
+    changed: bool,
+) -> None:
+    """Test that pages_changed() detects labels on a new page after the last
+    page, which leaves the ETag of the last page unchanged.
+    """
+    url = f"{base_url}/repos/{repo.owner}/{repo.name}/labels"
+    page = Page(url=url, etag='"abc"', link=f'<{url}?page=1>; rel="first"')
+    headers = {"ETag": '"abc"'}
+
+    if link is not None:
+        headers["Link"] = link.format(url=url)
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, url, status=304, headers=headers)
+
+        assert client.pages_changed([page]) is changed
+
+
+@pytest.mark.usefixtures("mock_list_labels_last_page")
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_list_labels_concurrent_pages(
+    client: Client, repo: Repository, jobs: int
+) -> None:
+    """Test that list_labels() returns the labels of all pages in order."""
+    labels = client.list_labels(repo, jobs=jobs)
+
+    assert [label.name for label in labels] == ["bug", "docs", "infra"]
+
+
+def test_label_params() -> None:
+    """Test that labels are slotted and compare by their parameters, which
+    exclude read-only attributes.
+    """
+    label = Label(color="ea707a", name="bug", description="Bugs", id=1, url="x")
+    remote_label = Label(color="ea707a", name="bug", description="Bugs", id=2)
+
+    assert not hasattr(label, "__dict__")
+    assert label.params_tuple == ("ea707a", "bug", "Bugs")
+    assert label.params_dict == {
+        "color": "ea707a",
+        "name": "bug",
+        "description": "Bugs",
+    }
+    assert label.params_dict is not label.params_dict
+    assert label.params_equal(remote_label)
+    assert label != remote_label
+    assert hash(label) == hash(attr.evolve(label))
+
+
+def test_label_pool() -> None:
+    """Test that labels from a pool share their parameters, but keep their
+    read-only attributes.
+    """
+    pool = LabelPool()
+
+    turtle = pool.label(color="ea707a", name="bug", description="Bugs", id=1)
+    earth = pool.label(color="ea707a", name="".join(["b", "ug"]), id=2)
+    moon = pool.label(color="ea707a", name="".join(["b", "ug"]), id=3)
+
+    assert len(pool) == 2
+    assert turtle.params_tuple == ("ea707a", "bug", "Bugs")
+    assert earth.params_tuple is moon.params_tuple
+    assert earth.name is moon.name
+    assert earth == Label(color="ea707a", name="bug", id=2)
+
+
+def test_page_urls(base_url: str) -> None:
+    """Test that page_urls() returns the URLs from the next to the last page."""
+    urls = page_urls(
+        f"{base_url}/repositories/1/labels?per_page=2&page=2",
+        f"{base_url}/repositories/1/labels?per_page=2&page=4",
+    )
+
+    assert urls == [
+        f"{base_url}/repositories/1/labels?per_page=2&page=2",
+        f"{base_url}/repositories/1/labels?per_page=2&page=3",
+        f"{base_url}/repositories/1/labels?per_page=2&page=4",
+    ]
+
+
+def test_page_urls_without_page(base_url: str) -> None:
+    """Test that page_urls() returns no URLs for links without a page."""
+    urls = page_urls(
+        f"{base_url}/repositories/1/labels?after=abc",
+        f"{base_url}/repositories/1/labels?after=xyz",
+    )
+
+    assert urls == []
+
+
 @pytest.mark.usefixtures("mock_get_label")
 def test_get_label(client: Client, repo: Repository) -> None:
     """Test that get_label() requests the specified label for the repo and
@@ -118,3 +278,108 @@ def test_delete_label(client: Client, repo: Repository) -> None:
     """Test that delete_label() performs the correct request."""
 
     client.delete_label(repo, name="bug")
+
+
+def graphql_labels(
+    *labels: typing.Dict, cursor: typing.Optional[str] = None
+) -> typing.Dict:
+    """Return a GraphQL response object for a page of labels."""
+    return {
+        "labels": {
+            "nodes": [
+                {
+                    "id": label["node_id"],
+                    "name": label["name"],
+                    "color": label["color"],
+                    "description": label["description"],
+                    "isDefault": label["default"],
+                }
+                for label in labels
+            ],
+            "pageInfo": {"hasNextPage": cursor is not None, "endCursor": cursor},
+        }
+    }
+
+
+def test_list_labels_graphql(
+    client: Client,
+    base_url: str,
+    response_get_bug: typing.Dict,
+    response_get_docs: typing.Dict,
+    response_get_infra: typing.Dict,
+) -> None:
+    """Test that list_labels_graphql() requests the labels of several
+    repositories per query and follows the cursors of paginated labels.
+    """
+    turtle = Repository("hackebrot", "turtle")
+    earth = Repository("hackebrot", "earth")
+    queries = []
+
+    def callback(request: typing.Any) -> typing.Tuple[int, typing.Dict, str]:
+        variables = json.loads(request.body)["variables"]
+        queries.append(variables)
+
+        if len(queries) == 1:
+            data = {
+                "repo0": graphql_labels(response_get_bug, cursor="abc"),
+                "repo1": graphql_labels(response_get_infra),
+            }
+        else:
+            data = {"repo0": graphql_labels(response_get_docs)}
+
+        return 200, {}, json.dumps({"data": data})
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(responses.POST, f"{base_url}/graphql", callback=callback)
+
+        repo_labels, repo_errors = client.list_labels_graphql([turtle, earth])
+
+    assert repo_errors == {}
+    assert [variables["cursor0"] for variables in queries] == [None, "abc"]
+    assert queries[1]["name0"] == "turtle"
+    assert "name1" not in queries[1]
+
+    assert [label.name for label in repo_labels[turtle]] == ["bug", "docs"]
+    assert [label.name for label in repo_labels[earth]] == ["infra"]
+    assert repo_labels[turtle][0] == Label(
+        color="ea707a",
+        name="bug",
+        description="Bugs and problems with cookiecutter",
+        default=True,
+        node_id="1010",
+        url=f"{base_url}/repos/hackebrot/turtle/labels/bug",
+    )
+
+
+def test_list_labels_graphql_not_found(
+    client: Client, base_url: str, response_get_bug: typing.Dict
+) -> None:
+    """Test that list_labels_graphql() reports errors for missing repos and
+    returns the labels of the other repos of the batch.
+    """
+    turtle = Repository("hackebrot", "turtle")
+    moon = Repository("hackebrot", "moon")
+    body = {
+        "data": {"repo0": graphql_labels(response_get_bug), "repo1": None},
+        "errors": [
+            {
+                "type": "NOT_FOUND",
+                "path": ["repo1"],
+                "message": "Could not resolve to a Repository",
+            }
+        ],
+    }
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.POST, f"{base_url}/graphql", json=body, status=200)
+
+        repo_labels, repo_errors = client.list_labels_graphql([turtle, moon])
+
+    assert [label.name for label in repo_labels[turtle]] == ["bug"]
+    assert moon not in repo_labels
+    assert list(repo_errors) == [moon]
+    assert isinstance(repo_errors[moon], GitHubException)
+    assert str(repo_errors[moon]) == (
+        "Error retrieving labels for hackebrot/moon: "
+        "Could not resolve to a Repository"
+    )
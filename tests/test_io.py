@@ -1,9 +1,26 @@
+import os
+import tempfile
 import typing
 
+import pytest
 import tomli
 
-from labels.github import Label
-from labels.io import write_labels, read_labels
+from labels.github import Label, Page, Repository
+from labels.io import (
+    LazyLabels,
+    LazySnapshot,
+    LazyTables,
+    load_labels_cached,
+    read_labels,
+    read_labels_cached,
+    read_snapshot,
+    read_state,
+    rename_sections,
+    write_labels,
+    write_snapshot_entry,
+    write_state,
+)
+from labels.state import RemoteState
 
 
 def test_write_labels(
@@ -28,3 +45,302 @@ def test_load_labels(labels_file_load: str, labels: typing.List[Label]) -> None:
     got = read_labels(labels_file_load)
 
     assert got == want
+
+
+def test_write_snapshot_entry(
+    labels_file_write: str, labels: typing.List[Label]
+) -> None:
+    """Test that snapshot entries for several repositories can be written one
+    after another and read back.
+    """
+    with open(labels_file_write, "wb") as snapshot_file:
+        write_snapshot_entry(snapshot_file, Repository("hackebrot", "turtle"), labels)
+        write_snapshot_entry(snapshot_file, Repository("hackebrot", "earth"), [])
+
+    got = read_snapshot(labels_file_write)
+
+    assert got == {
+        "hackebrot/turtle": {label.name: label for label in labels},
+        "hackebrot/earth": {},
+    }
+
+
+def test_write_labels_previous_names(labels_file_write: str) -> None:
+    """Test that write_labels() keeps the previous names of labels."""
+    label = Label(color="2abf88", name="documentation", previous_names=("docs",))
+
+    write_labels(labels_file_write, [label])
+
+    assert read_labels(labels_file_write) == {"documentation": label}
+
+
+def test_write_state(labels_file_write: str, labels: typing.List[Label]) -> None:
+    """Test that the remote state of repositories can be written and read
+    back, and that a missing state file holds no state.
+    """
+    assert read_state(labels_file_write) == {}
+
+    states = {
+        Repository("hackebrot", "turtle"): RemoteState(
+            labels=labels,
+            pages=[Page(url="https://api.github.com/turtle", etag='"abc"')],
+        ),
+        Repository("hackebrot", "earth"): RemoteState(),
+    }
+
+    write_state(labels_file_write, states)
+
+    assert read_state(labels_file_write) == states
+
+
+def test_binary_labels(binary_file_write: str, labels: typing.List[Label]) -> None:
+    """Test that labels can be written to and read from a binary file."""
+    renamed = Label(color="2abf88", name="dökümentation", previous_names=("docs",))
+
+    write_labels(binary_file_write, labels + [renamed])
+
+    assert read_labels(binary_file_write) == {
+        label.name: label for label in labels + [renamed]
+    }
+
+
+def test_binary_snapshot(binary_file_write: str, labels: typing.List[Label]) -> None:
+    """Test that binary snapshot entries for several repositories can be
+    written one after another and read back.
+    """
+    with open(binary_file_write, "wb") as snapshot_file:
+        for name, repo_labels in [("turtle", labels), ("earth", [])]:
+            write_snapshot_entry(
+                snapshot_file,
+                Repository("hackebrot", name),
+                repo_labels,
+                binary_format=True,
+            )
+
+    assert read_snapshot(binary_file_write) == {
+        "hackebrot/turtle": {label.name: label for label in labels},
+        "hackebrot/earth": {},
+    }
+
+
+def test_binary_state(binary_file_write: str, labels: typing.List[Label]) -> None:
+    """Test that the remote state can be written to and read from a binary
+    file.
+    """
+    states = {
+        Repository("hackebrot", "turtle"): RemoteState(
+            labels=labels,
+            pages=[Page(url="https://api.github.com/turtle", etag='"abc"')],
+        ),
+    }
+
+    write_state(binary_file_write, states)
+
+    assert read_state(binary_file_write) == states
+
+
+@pytest.mark.parametrize(
+    "content",
+    [b"", b"[bug]", b"LABELS\x00\x02\x05\x00", b"LABELS\x00\x02\x05\x00\x00\x00ab"],
+)
+def test_binary_invalid(binary_file_write: str, content: bytes) -> None:
+    """Test that reading invalid or truncated binary files fails."""
+    with open(binary_file_write, "wb") as binary_file:
+        binary_file.write(content)
+
+    with pytest.raises(ValueError):
+        read_labels(binary_file_write)
+
+
+def test_lazy_labels(labels_file_load: str) -> None:
+    """Test that LazyLabels maps the same section names to the same labels
+    as read_labels(), but only parses the sections that are accessed.
+    """
+    want = read_labels(labels_file_load)
+
+    with LazyLabels(labels_file_load) as lazy_labels:
+        assert list(lazy_labels) == list(want)
+        assert lazy_labels["code quality"] == want["code quality"]
+        assert len(lazy_labels._tables) == 1
+        assert lazy_labels.header_offset("bug") == 0
+        assert "missing" not in lazy_labels
+
+    with pytest.raises(ValueError):
+        lazy_labels["bug"]
+
+    with LazyLabels(labels_file_load) as lazy_labels:
+        assert dict(lazy_labels) == want
+
+
+def test_lazy_tables_abstract(labels_file_load: str) -> None:
+    """Test that LazyTables requires subclasses to load tables."""
+    with pytest.raises(TypeError):
+        LazyTables(labels_file_load)  # type: ignore
+
+
+def test_lazy_snapshot(labels_file_write: str, labels: typing.List[Label]) -> None:
+    """Test that LazySnapshot maps repositories to the same labels as
+    read_snapshot().
+    """
+    with open(labels_file_write, "wb") as snapshot_file:
+        write_snapshot_entry(snapshot_file, Repository("hackebrot", "turtle"), labels)
+        write_snapshot_entry(snapshot_file, Repository("hackebrot", "earth"), [])
+        write_snapshot_entry(snapshot_file, Repository("hackebrot", "moon"), labels)
+
+    with LazySnapshot(labels_file_write) as snapshot:
+        assert dict(snapshot) == read_snapshot(labels_file_write)
+
+
+def test_lazy_labels_empty(labels_file_write: str) -> None:
+    """Test that LazyLabels supports empty files."""
+    with open(labels_file_write, "wb"):
+        pass
+
+    with LazyLabels(labels_file_write) as lazy_labels:
+        assert len(lazy_labels) == 0
+
+
+def test_write_labels_unchanged(
+    mocker: typing.Any, labels_file_write: str, labels: typing.List[Label]
+) -> None:
+    """Test that write_labels() does not write a temporary file or replace
+    a file with the same content.
+    """
+    assert write_labels(labels_file_write, labels)
+    os.chmod(labels_file_write, 0o640)
+    inode = os.stat(labels_file_write).st_ino
+    mkstemp = mocker.spy(tempfile, "mkstemp")
+
+    assert not write_labels(labels_file_write, iter(labels))
+    assert os.stat(labels_file_write).st_ino == inode
+    assert mkstemp.call_count == 0
+
+    assert write_labels(labels_file_write, labels[1:])
+    assert os.stat(labels_file_write).st_mode & 0o777 == 0o640
+    assert list(read_labels(labels_file_write).values()) == labels[1:]
+
+
+@pytest.mark.parametrize(
+    "indexes", [[0], [0, 1, 2], [0, 2]], ids=["shorter", "longer", "different"]
+)
+def test_write_labels_changed_end(
+    labels_file_write: str, labels: typing.List[Label], indexes: typing.List[int]
+) -> None:
+    """Test that write_labels() replaces a file whose content only differs
+    after the start that it has in common with the labels.
+    """
+    write_labels(labels_file_write, labels[:2])
+    new_labels = [labels[index] for index in indexes]
+
+    assert write_labels(labels_file_write, new_labels)
+    assert list(read_labels(labels_file_write).values()) == new_labels
+
+
+def test_write_labels_error(
+    labels_file_write: str, labels: typing.List[Label]
+) -> None:
+    """Test that write_labels() keeps the file if writing labels fails."""
+    write_labels(labels_file_write, labels)
+
+    with pytest.raises(ValueError):
+        write_labels(labels_file_write, labels + labels)
+
+    assert os.listdir(os.path.dirname(labels_file_write)) == ["labels.toml"]
+    assert list(read_labels(labels_file_write).values()) == labels
+
+
+def test_write_labels_binary_error(
+    binary_file_write: str, labels: typing.List[Label]
+) -> None:
+    """Test that write_labels() rejects labels with the same name for binary
+    files, just like for TOML files.
+    """
+    with pytest.raises(ValueError, match='Duplicate label name: "bug"'):
+        write_labels(binary_file_write, labels + labels)
+
+    assert not os.path.exists(binary_file_write)
+
+
+def test_rename_sections(labels_file_write: str) -> None:
+    """Test that rename_sections() only rewrites the headers of the renamed
+    sections of a TOML file.
+    """
+    content = """# Labels for the turtle repository
+[bug]
+color = "ea707a"
+name = "bug"
+
+[docs] # Renamed
+color = "2abf88"
+name = "documentation"
+
+[infra]
+color = "f9d03b"
+name = "infra"
+"""
+    with open(labels_file_write, "w", encoding="utf-8") as labels_file:
+        labels_file.write(content)
+
+    assert not rename_sections(labels_file_write, {})
+    assert rename_sections(labels_file_write, {"docs": "documentation"})
+
+    want = content.replace("[docs] # Renamed", "[documentation]")
+
+    with open(labels_file_write, "r", encoding="utf-8") as labels_file:
+        assert labels_file.read() == want
+
+    with pytest.raises(ValueError):
+        rename_sections(labels_file_write, {"bug": "infra"})
+
+    with pytest.raises(ValueError):
+        rename_sections(labels_file_write, {"bug": "x", "infra": "x"})
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        'docs = { color = "2abf88", name = "documentation" }\n',
+        '  [docs]\n  color = "2abf88"\n  name = "documentation"\n',
+        '[docs]\ncolor = "2abf88"\nname = "documentation"\n'
+        'description = """Docs\n[see the guide\n[docs]\n"""\n',
+    ],
+    ids=["inline_table", "indented_header", "multiline_string"],
+)
+def test_rename_sections_rewrite(labels_file_write: str, content: str) -> None:
+    """Test that rename_sections() rewrites the whole file if it cannot find
+    the header lines of the renamed sections.
+    """
+    with open(labels_file_write, "w", encoding="utf-8") as labels_file:
+        labels_file.write(content)
+
+    want = {
+        "documentation": label
+        for label in read_labels(labels_file_write).values()
+    }
+
+    assert rename_sections(labels_file_write, {"docs": "documentation"})
+    assert read_labels(labels_file_write) == want
+
+
+def test_read_labels_cached(
+    labels_file_write: str, labels: typing.List[Label]
+) -> None:
+    """Test that read_labels_cached() only parses a file again once it
+    changed, and that the cached labels are read-only.
+    """
+    load_labels_cached.cache_clear()
+    write_labels(labels_file_write, labels)
+
+    cached = read_labels_cached(labels_file_write)
+
+    assert cached == read_labels(labels_file_write)
+    assert read_labels_cached(labels_file_write) is cached
+    assert load_labels_cached.cache_info().hits == 1
+
+    with pytest.raises(TypeError):
+        cached["bug"] = labels[0]  # type: ignore
+
+    write_labels(labels_file_write, labels[1:])
+
+    assert read_labels_cached(labels_file_write) == read_labels(labels_file_write)
+    assert load_labels_cached.cache_info().misses == 2
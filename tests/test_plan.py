@@ -0,0 +1,144 @@
+import typing
+
+import pytest
+
+from labels.exceptions import PlanException
+from labels.github import Label, LabelPool
+from labels.plan import Plan, compute_plan
+
+
+@pytest.fixture(name="remote_labels")
+def fixture_remote_labels() -> typing.List[Label]:
+    """Return labels as they are returned by the GitHub API."""
+    return [
+        Label(color="ea707a", name="bug", default=True, id=1),
+        Label(color="2abf88", name="docs", id=2),
+        Label(color="f9d03b", name="infra", id=3),
+    ]
+
+
+def test_compute_plan(remote_labels: typing.List[Label]) -> None:
+    """Test that compute_plan() sorts labels into delete, update, create and
+    ignore by comparing label parameters only.
+    """
+    local_labels = {
+        "bug": Label(color="fcc4db", name="bug"),
+        "docs": Label(color="2abf88", name="docs"),
+        "dependencies": Label(color="43a2b7", name="dependencies"),
+    }
+
+    plan = compute_plan(local_labels, remote_labels)
+
+    assert plan == Plan(
+        delete={"infra": remote_labels[2]},
+        update={"bug": local_labels["bug"]},
+        create={"dependencies": local_labels["dependencies"]},
+        ignore={"docs": local_labels["docs"]},
+    )
+    assert plan.changed
+
+
+def test_compute_plan_rename(remote_labels: typing.List[Label]) -> None:
+    """Test that compute_plan() updates a label whose name parameter differs
+    from the section name.
+    """
+    local_labels = {"bug": Label(color="ea707a", name="defect")}
+
+    plan = compute_plan(local_labels, remote_labels[:1])
+
+    assert plan == Plan(update={"bug": local_labels["bug"]})
+
+
+def test_compute_plan_unchanged(remote_labels: typing.List[Label]) -> None:
+    """Test that compute_plan() returns a plan without changes."""
+    local_labels = {
+        label.name: Label(color=label.color, name=label.name)
+        for label in remote_labels
+    }
+
+    plan = compute_plan(local_labels, remote_labels)
+
+    assert not plan.changed
+    assert list(plan.ignore) == ["bug", "docs", "infra"]
+
+
+def test_compute_plan_unknown_section(remote_labels: typing.List[Label]) -> None:
+    """Test that compute_plan() raises an error for a section that is neither
+    a remote label nor the name of its label.
+    """
+    local_labels = {"feature": Label(color="ea707a", name="enhancement")}
+
+    with pytest.raises(PlanException, match='no remote label "feature"'):
+        compute_plan(local_labels, remote_labels)
+
+
+def test_compute_plan_previous_names(remote_labels: typing.List[Label]) -> None:
+    """Test that compute_plan() renames a remote label listed in the previous
+    names of a local label instead of deleting and creating labels.
+    """
+    local_labels = {
+        "documentation": Label(
+            color="2abf88", name="documentation", previous_names=("docs",)
+        ),
+    }
+
+    plan = compute_plan(local_labels, remote_labels)
+
+    assert plan.update == {"docs": local_labels["documentation"]}
+    assert plan.create == {}
+    assert list(plan.delete) == ["bug", "infra"]
+
+
+def test_compute_plan_detect_renames() -> None:
+    """Test that compute_plan() detects renames of labels with the same color
+    and description, unless the match is ambiguous or has no description.
+    """
+    remote_labels = [
+        Label(color="2abf88", name="docs", description="Documentation"),
+        Label(color="ea707a", name="bug", description="Problems"),
+        Label(color="ea707a", name="crash", description="Problems"),
+        Label(color="f9d03b", name="infra"),
+    ]
+    local_labels = {
+        "documentation": Label(
+            color="2ABF88", name="documentation", description="Documentation"
+        ),
+        "defect": Label(color="ea707a", name="defect", description="Problems"),
+        "ci": Label(color="f9d03b", name="ci"),
+    }
+
+    assert compute_plan(local_labels, remote_labels).update == {}
+
+    plan = compute_plan(local_labels, remote_labels, detect_renames=True)
+
+    assert plan.update == {"docs": local_labels["documentation"]}
+    assert list(plan.create) == ["defect", "ci"]
+    assert list(plan.delete) == ["bug", "crash", "infra"]
+
+
+@pytest.mark.parametrize(
+    "make_label", [Label, LabelPool().label], ids=["label", "label_pool"]
+)
+def test_compute_plan_detect_renames_null_description(
+    make_label: typing.Callable[..., Label],
+    response_get_question: typing.Dict[str, typing.Any],
+) -> None:
+    """Test that compute_plan() detects renames when GitHub returns a null
+    description for a remote label.
+    """
+    remote_labels = [
+        make_label(**response_get_question),
+        Label(color="2abf88", name="docs", description="Documentation"),
+    ]
+    local_labels = {
+        "documentation": Label(
+            color="2abf88", name="documentation", description="Documentation"
+        ),
+    }
+
+    plan = compute_plan(local_labels, remote_labels, detect_renames=True)
+
+    assert remote_labels[0].description == ""
+    assert remote_labels[0].params_tuple == ("cc317c", "question", "")
+    assert plan.update == {"docs": local_labels["documentation"]}
+    assert list(plan.delete) == ["question"]
@@ -0,0 +1,133 @@
+import typing
+
+import pytest
+import requests
+import responses
+from requests.auth import HTTPBasicAuth
+
+from labels.github import Client, Repository
+from labels.ratelimit import RateLimiter
+
+
+class FakeTime:
+    """Fake clock that advances when sleeping."""
+
+    def __init__(self, now: float) -> None:
+        self.now = now
+        self.sleeps: typing.List[float] = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture(name="fake_time")
+def fixture_fake_time() -> FakeTime:
+    """Return a fake clock."""
+    return FakeTime(1000.0)
+
+
+@pytest.fixture(name="rate_limiter")
+def fixture_rate_limiter(fake_time: FakeTime) -> RateLimiter:
+    """Return a rate limiter using the fake clock."""
+    return RateLimiter(reserve=10, clock=fake_time.clock, sleep=fake_time.sleep)
+
+
+def make_response(status: int, headers: typing.Dict[str, str]) -> requests.Response:
+    """Return a response with the given status code and headers."""
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = b""
+    return response
+
+
+def test_wait_without_information(
+    rate_limiter: RateLimiter, fake_time: FakeTime
+) -> None:
+    """Test that wait() does not block before the rate limit is known."""
+    rate_limiter.wait()
+    rate_limiter.wait()
+
+    assert fake_time.sleeps == []
+
+
+def test_wait_spreads_reserve(rate_limiter: RateLimiter, fake_time: FakeTime) -> None:
+    """Test that wait() spreads the remaining requests until the reset."""
+    rate_limiter.update(
+        make_response(
+            200, {"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": "1100"}
+        )
+    )
+
+    rate_limiter.wait()
+    rate_limiter.wait()
+
+    assert fake_time.sleeps == [20.0]
+
+
+def test_wait_until_reset(rate_limiter: RateLimiter, fake_time: FakeTime) -> None:
+    """Test that wait() blocks until the reset without remaining requests."""
+    rate_limiter.update(
+        make_response(
+            200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1300"}
+        )
+    )
+
+    rate_limiter.wait()
+
+    assert fake_time.sleeps == [300.0]
+
+
+@pytest.mark.parametrize(
+    "status, headers, want",
+    [
+        (403, {"Retry-After": "30"}, True),
+        (429, {"Retry-After": "30"}, True),
+        (403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1030"}, True),
+        (403, {}, False),
+        (404, {"Retry-After": "30"}, False),
+    ],
+)
+def test_backoff(
+    rate_limiter: RateLimiter,
+    fake_time: FakeTime,
+    status: int,
+    headers: typing.Dict[str, str],
+    want: bool,
+) -> None:
+    """Test that backoff() detects rate limited responses."""
+    assert rate_limiter.backoff(make_response(status, headers)) is want
+
+    rate_limiter.wait()
+
+    assert fake_time.sleeps == ([30.0] if want else [])
+
+
+def test_client_retries_rate_limited_request(
+    base_url: str,
+    username: str,
+    token: str,
+    repo_owner: str,
+    repo_name: str,
+    response_get_bug: typing.Dict,
+    rate_limiter: RateLimiter,
+    fake_time: FakeTime,
+) -> None:
+    """Test that the client retries requests after a secondary rate limit."""
+    client = Client(
+        HTTPBasicAuth(username, token), base_url=base_url, rate_limiter=rate_limiter
+    )
+    url = f"{base_url}/repos/{repo_owner}/{repo_name}/labels/bug"
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, url, status=403, headers={"Retry-After": "60"})
+        rsps.add(responses.GET, url, json=response_get_bug, status=200)
+
+        label = client.get_label(Repository(repo_owner, repo_name), name="bug")
+
+    assert label.name == "bug"
+    assert fake_time.sleeps == [60.0]
@@ -0,0 +1,166 @@
+import http.server
+import json
+import threading
+import typing
+
+import pytest
+import responses
+from requests.auth import HTTPBasicAuth
+
+from labels.github import Client, Label, Repository
+from labels.transport import RetryPolicy, create_retry_policy, create_session
+
+
+def test_retry_policy_keeps_jitter() -> None:
+    """Test that the retry policy keeps its jitter after an attempt."""
+    retry = create_retry_policy(total=3, backoff_factor=1.0, jitter=0.25)
+    retry = retry.increment(method="GET", url="/")
+    retry = retry.increment(method="GET", url="/")
+
+    assert isinstance(retry, RetryPolicy)
+    assert retry.jitter == 0.25
+    assert 2.0 <= retry.get_backoff_time() <= 2.25
+
+
+def test_client_mounts_retry_policy(username: str, token: str) -> None:
+    """Test that the client uses the retry policy for its transport adapter."""
+    retry = create_retry_policy(total=5)
+    client = Client(HTTPBasicAuth(username, token), retries=retry)
+
+    adapter = client.session.get_adapter("https://api.github.com")
+
+    assert adapter.max_retries is retry  # type: ignore
+
+
+def test_client_pool_options(username: str, token: str) -> None:
+    """Test that the client configures the connection pool of its session."""
+    client = Client(
+        HTTPBasicAuth(username, token),
+        pool_connections=4,
+        pool_maxsize=32,
+        pool_block=True,
+    )
+
+    adapter = client.session.get_adapter("https://api.github.com")
+
+    assert adapter._pool_connections == 4  # type: ignore
+    assert adapter._pool_maxsize == 32  # type: ignore
+    assert adapter._pool_block is True  # type: ignore
+
+
+def test_clients_share_session(
+    base_url: str, repo_owner: str, repo_name: str, response_get_bug: typing.Dict
+) -> None:
+    """Test that clients sharing a session send their own credentials and
+    timeouts.
+    """
+    session = create_session()
+    first = Client(
+        HTTPBasicAuth("first", "1"), base_url=base_url, session=session, timeout=None
+    )
+    second = Client(
+        HTTPBasicAuth("second", "2"),
+        base_url=base_url,
+        session=session,
+        timeout=(1.0, 2.0),
+    )
+    repo = Repository(repo_owner, repo_name)
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            f"{base_url}/repos/{repo_owner}/{repo_name}/labels/bug",
+            json=response_get_bug,
+            status=200,
+        )
+
+        first.get_label(repo, name="bug")
+        second.get_label(repo, name="bug")
+
+        first_request, second_request = (call.request for call in rsps.calls)
+
+    assert first.session is second.session
+    assert first_request.headers["Authorization"] == "Basic Zmlyc3Q6MQ=="
+    assert second_request.headers["Authorization"] == "Basic c2Vjb25kOjI="
+    assert first_request.req_kwargs["timeout"] is None  # type: ignore
+    assert second_request.req_kwargs["timeout"] == (1.0, 2.0)  # type: ignore
+
+
+@pytest.fixture(name="flaky_server")
+def fixture_flaky_server(
+    response_get_bug: typing.Dict,
+) -> typing.Generator[str, None, None]:
+    """Run a local API server that fails the first two requests with a 503."""
+    requests_received = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_PATCH(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.do_GET()
+
+        def do_GET(self) -> None:
+            requests_received.append(self.path)
+
+            if len(requests_received) <= 2:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            body = json.dumps(response_get_bug).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: typing.Any) -> None:
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}"
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_retries_transient_errors(
+    flaky_server: str, username: str, token: str
+) -> None:
+    """Test that the client retries requests that failed with a 503."""
+    client = Client(
+        HTTPBasicAuth(username, token),
+        base_url=flaky_server,
+        retries=create_retry_policy(backoff_factor=0.01, jitter=0.01),
+    )
+
+    label = client.get_label(Repository("hackebrot", "turtle"), name="bug")
+
+    assert label.name == "bug"
+
+
+def test_client_retries_edits(
+    flaky_server: str, username: str, token: str, label: Label
+) -> None:
+    """Test that the client retries editing a label that failed with a 503."""
+    client = Client(
+        HTTPBasicAuth(username, token),
+        base_url=flaky_server,
+        retries=create_retry_policy(backoff_factor=0.01, jitter=0.01),
+    )
+
+    repository = Repository("hackebrot", "turtle")
+    edited = client.edit_label(repository, name="bug", label=label)
+
+    assert edited.name == "bug"
+
+
+def test_retry_policy_methods() -> None:
+    """Test that the retry policy retries edits, but not creating labels."""
+    retry = create_retry_policy()
+
+    assert retry._is_method_retryable("PATCH")
+    assert not retry._is_method_retryable("POST")
@@ -36,3 +36,25 @@ def test_load_repository_bad_url(mock_repo_info_bad_url):
     repo = utils.load_repository_info()
     assert repo is None
     assert mock_repo_info_bad_url.called
+
+
+def test_read_repositories(tmpdir):
+    """Test that read_repositories() skips blank lines and comments."""
+    repos_file = tmpdir.join("repos.txt")
+    repos_file.write("# Python projects\npytest-dev/pytest\n\nhackebrot/labels\n")
+
+    repositories = utils.read_repositories(str(repos_file))
+    assert [(repo.owner, repo.name) for repo in repositories] == [
+        ("pytest-dev", "pytest"),
+        ("hackebrot", "labels"),
+    ]
+
+
+@pytest.mark.parametrize("line", ["pytest", "pytest-dev/", "a/b/c"])
+def test_read_repositories_invalid(tmpdir, line):
+    """Test that read_repositories() rejects lines that are not owner/name."""
+    repos_file = tmpdir.join("repos.txt")
+    repos_file.write(f"hackebrot/labels\n{line}\n")
+
+    with pytest.raises(ValueError, match="line 2"):
+        utils.read_repositories(str(repos_file))